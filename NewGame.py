@@ -1,13 +1,19 @@
 import pygame
-import cv2
-import torch
+import os
 import numpy as np
-from ultralytics import YOLO
-import requests
-from io import BytesIO
 import sys
 import random
 import time
+from collections import deque
+from assets import asset_cache, NEW_GAME_ASSETS
+from entities import EntityStore, COIL, BOMB, SPEED_BOOST, MAGNET, X2, SHOT, POWER_UPS, POWER_UP_KINDS
+from hud import CameraPreview, StatsOverlay, text_renderer
+from render import DirtyRenderer, ScrollingBackground
+from roi import roi_from_env
+from startup import draw_loading, make_loader
+from timestep import FixedTimestep, lerp
+from timing import metrics_from_env
+from tracker import Tracker
 
 pygame.init()
 
@@ -16,107 +22,77 @@ screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Underwater Object Detection Game")
 clock = pygame.time.Clock()
 FPS = 30
+MENU_FPS = 15
+SIM_HZ = 30
+CONTROL_TIMEOUT = 0.5
+DETECT_INTERVAL = 3
+GAME_STAGES = ["capture", "resize", "convert", "inference", "propagate", "postprocess", "simulation", "render", "present"]
+loader = make_loader(NEW_GAME_ASSETS, "new_game", preferred_camera=0)
 
-
-def load_image(url, size=None):
-    response = requests.get(url)
-    image = pygame.image.load(BytesIO(response.content)).convert_alpha()
-    if size:
-        image = pygame.transform.scale(image, size)
-    return image
-
-
-
-player_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/f2.png?alt=media&token=a01aa678-4437-4408-8479-e69ddb05c7f3"
-coil_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/image.png?alt=media&token=e7cd5083-7d87-466b-9296-8d171014f6be"
-background_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/DALLE_2024-10-02_11.02.21_-_A_cartoon-style_background_image_resembling_an_underwater_scene_with_light_aqua-green_tones._The_top_section_has_simplified_exaggerated_wave_patterns.webp?alt=media&token=f290632a-10ad-461e-9622-7ed49ccc7999"
-speed_boost_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/images%20(1).jpg?alt=media&token=a5f1cf23-fda6-4cc9-a7c6-6c4eadcd3c21"
-magnet_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/images.jpg?alt=media&token=b9ac4fdd-b44e-497a-a4da-1e5d47eb624b"
-x2_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/x2-3d-rendering-on-white-260nw-1467989987%20(1).webp?alt=media&token=176b3b0a-2573-44bf-bb48-9d48fea098ac"
-bomb_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/depositphotos_3622851-stock-photo-bomb.jpg?alt=media&token=5c0ed80f-d133-4ecc-ba8b-2dfd2b343fdb"
-boss_image_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/image-removebg-preview%20(63).png?alt=media&token=d83eab77-3b43-49e4-8a12-1906986e2e72"
-
-def check():
-    try:
-        player_img = load_image(player_url, size=(128, 128))
-        coil_img = load_image(coil_url, size=(64, 64))
-        background_img = load_image(background_url, size=(SCREEN_WIDTH, SCREEN_HEIGHT))
-        speed_boost_img = load_image(speed_boost_url, size=(64, 64))
-        magnet_img = load_image(magnet_url, size=(64, 64))
-        x2_img = load_image(x2_url, size=(64, 64))
-        bomb_img = load_image(bomb_url, size=(64, 64))
-        boss_img = load_image(boss_image_url, size=(200, 200))
-        if None in [player_img, coil_img, background_img, speed_boost_img, magnet_img, x2_img, bomb_img, boss_img]:
-            print("One or more images failed to load.")
-            return False
-        
-        try:
-            model = YOLO("best.pt")
-        except Exception as e:
-            print(f"Error loading YOLO model: {e}")
-            return False
-
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Error: Could not open video source.")
-            return False
-        cap.release()
-
-        return True
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return False
-
-check()
-
-try:
-    player_img = load_image(player_url, size=(128, 128))
-    coil_img = load_image(coil_url, size=(64, 64))
-    background_img = load_image(background_url, size=(SCREEN_WIDTH, SCREEN_HEIGHT))
-    speed_boost_img = load_image(speed_boost_url, size=(64, 64))
-    magnet_img = load_image(magnet_url, size=(64, 64))
-    x2_img = load_image(x2_url, size=(64, 64))
-    bomb_img = load_image(bomb_url, size=(64, 64))
-    boss_img = load_image(boss_image_url, size=(200, 200))
-except:
-    pygame.quit()
-    sys.exit()
-
-player_rect = player_img.get_rect(center=(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2))
 player_speed = 3
+background_speed = 1
+TARGET_LABELS = ["green", "blue", "orange"]
+
+def load_images():
+    # Decoded from the asset cache on the main thread once the loader is done.
+    global player_img, coil_img, background_img, speed_boost_img, magnet_img, x2_img, bomb_img, boss_img, entity_images, player_rect
+    images = asset_cache.load_all(NEW_GAME_ASSETS, "new_game")
+    player_img = images["player"]
+    coil_img = images["coil"]
+    background_img = images["background"]
+    speed_boost_img = images["speed_boost"]
+    magnet_img = images["magnet"]
+    x2_img = images["x2"]
+    bomb_img = images["bomb"]
+    boss_img = images["boss"]
+    entity_images = {COIL: coil_img, BOMB: bomb_img, SPEED_BOOST: speed_boost_img, MAGNET: magnet_img, X2: x2_img}
+    player_rect = player_img.get_rect(center=(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2))
 
 def draw_text(text, size, color, x, y):
-    font = pygame.font.Font(None, size)
-    text_surface = font.render(text, True, color)
-    screen.blit(text_surface, (x, y))
+    screen.blit(text_renderer.render(text, size, color), (x, y))
 
 def start_menu():
     start_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 - 50, 200, 100)
+    progress_bar = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 80, 300, 20)
     running = True
+    dirty = True
+    shown = None
     while running:
-        screen.fill((0, 105, 148))
-        draw_text("Underwater Object Game", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
-        pygame.draw.rect(screen, (255, 255, 255), start_button)
-        draw_text("Start", 36, (0, 0, 0), start_button.x + 50, start_button.y + 25)
-        pygame.display.flip()
+        # Redrawn when the window needs it or the loader has moved on.
+        if dirty or loader.state != shown:
+            shown = loader.state
+            screen.fill((0, 105, 148))
+            draw_text("Underwater Object Game", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
+            draw_loading(screen, loader, start_button, progress_bar)
+            dirty = False
+        clock.tick(MENU_FPS)
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                dirty = True
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if start_button.collidepoint(event.pos):
+                if start_button.collidepoint(event.pos) and loader.ready:
+                    load_images()
                     return
 
 def pause_menu():
     resume_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2, 200, 100)
     paused = True
+    dirty = True
     while paused:
-        screen.fill((50, 50, 50))
-        draw_text("Paused", 80, (255, 255, 255), SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 - 150)
-        pygame.draw.rect(screen, (255, 255, 255), resume_button)
-        draw_text("Resume", 36, (0, 0, 0), resume_button.x + 50, resume_button.y + 25)
-        pygame.display.flip()
+        if dirty:
+            screen.fill((50, 50, 50))
+            draw_text("Paused", 80, (255, 255, 255), SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 - 150)
+            pygame.draw.rect(screen, (255, 255, 255), resume_button)
+            draw_text("Resume", 36, (0, 0, 0), resume_button.x + 50, resume_button.y + 25)
+            pygame.display.flip()
+            dirty = False
+        clock.tick(MENU_FPS)
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                dirty = True
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -127,14 +103,20 @@ def pause_menu():
 def game_over_screen(score):
     restart_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2, 200, 100)
     running = True
+    dirty = True
     while running:
-        screen.fill((0, 0, 0))
-        draw_text("Game Over", 80, (255, 0, 0), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
-        draw_text(f"Score: {score}", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 - 50)
-        pygame.draw.rect(screen, (255, 255, 255), restart_button)
-        draw_text("Restart", 36, (0, 0, 0), restart_button.x + 50, restart_button.y + 25)
-        pygame.display.flip()
+        if dirty:
+            screen.fill((0, 0, 0))
+            draw_text("Game Over", 80, (255, 0, 0), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
+            draw_text(f"Score: {score}", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 - 50)
+            pygame.draw.rect(screen, (255, 255, 255), restart_button)
+            draw_text("Restart", 36, (0, 0, 0), restart_button.x + 50, restart_button.y + 25)
+            pygame.display.flip()
+            dirty = False
+        clock.tick(MENU_FPS)
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                dirty = True
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -143,19 +125,116 @@ def game_over_screen(score):
                     return True
         return False
 
-def spawn_coil():
-    coil_rect = coil_img.get_rect(topleft=(SCREEN_WIDTH + random.randint(0, 200), random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT - 64)))
-    return coil_rect
+def steer(tracks, names):
+    # Player control from one detection's tracks, and the boxes the preview shows.
+    player_control = 0
+    boxes = []
+    for track in tracks:
+        label = names[track.cls]
+        if label in TARGET_LABELS:
+            if track.hits > 1:
+                delta_y = track.delta[1]
+                if delta_y < -5:
+                    player_control += player_speed
+                elif delta_y > 5:
+                    player_control -= player_speed
+            boxes.append((*track.box, f"{label} #{track.id}"))
+
+    if not boxes:
+        player_control = -player_speed * 2
+    return player_control, boxes
+
+class GameWorld:
+    # Everything one simulation step changes. game_loop draws it; benchmark.py
+    # drives the same step headless.
+    def __init__(self, player_rect, entity_images):
+        self.player_rect = player_rect
+        self.sizes = {kind: image.get_size() for kind, image in entity_images.items()}
+        self.entities = EntityStore()
+        self.score = 0
+        self.speed_boost_active = False
+        self.magnet_active = False
+        self.x2_active = False
+        self.power_up_timer = 0
+        self.power_up_name = ""
+        self.background_x = 0
+        self.previous_background_x = 0
+        self.previous_player_y = player_rect.y
+        self.coil_spawn_timer = 0
+        self.bomb_spawn_timer = 0
+        self.power_up_spawn_timer = 0
+        self.game_over = False
+        self.boss_fight = False
+
+    def spawn(self, kind, spread=200, spawn_time=0.0):
+        self.entities.spawn(kind, SCREEN_WIDTH + random.randint(0, spread), random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT - 64), *self.sizes[kind], spawn_time)
+
+    def spawn_power_up(self):
+        power_up_type = random.choice(["speed_boost", "magnet", "x2"])
+        self.spawn(POWER_UP_KINDS[power_up_type], 400, time.time())
+
+    def step(self, player_control):
+        # One 1 / SIM_HZ step. Hitting a bomb sets game_over; reaching the boss
+        # score clears the field and sets boss_fight.
+        entities = self.entities
+        player_rect = self.player_rect
+        self.previous_player_y = player_rect.y
+        self.previous_background_x = self.background_x
+        entities.save_previous()
+
+        player_rect.y += player_control
+        player_rect.y = max(SCREEN_HEIGHT // 4, min(player_rect.y, SCREEN_HEIGHT - player_rect.height))
 
-def spawn_bomb():
-    bomb_rect = bomb_img.get_rect(topleft=(SCREEN_WIDTH + random.randint(0, 200), random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT - 64)))
-    return bomb_rect
+        entities.move(-player_speed)
+        hit = entities.collide(player_rect)
+        self.score += int((hit & entities.of_kind(COIL)).sum()) * (2 if self.x2_active else 1)
+        if (hit & entities.of_kind(BOMB)).any():
+            self.game_over = True
+
+        for power_up_kind in entities.kind[:entities.count][hit & entities.of_kind(*POWER_UPS)].tolist():
+            if power_up_kind == SPEED_BOOST:
+                self.speed_boost_active = True
+                self.power_up_name = "Speed Boost"
+            elif power_up_kind == MAGNET:
+                self.magnet_active = True
+                self.power_up_name = "Magnet"
+            elif power_up_kind == X2:
+                self.x2_active = True
+                self.power_up_name = "X2"
+            self.power_up_timer = 10 * SIM_HZ
+
+        entities.remove((hit & ~entities.of_kind(BOMB)) | entities.outside(left=0))
+
+        if self.power_up_timer > 0:
+            self.power_up_timer -= 1
+        else:
+            self.speed_boost_active = self.magnet_active = self.x2_active = False
+            self.power_up_name = ""
+
+        if self.coil_spawn_timer <= 0 and entities.count_kind(COIL) < 5:
+            self.spawn(COIL)
+            self.coil_spawn_timer = random.randint(60, 180)
+
+        if self.bomb_spawn_timer <= 0 and entities.count_kind(BOMB) < 3:
+            self.spawn(BOMB)
+            self.bomb_spawn_timer = random.randint(120, 300)
+
+        if self.power_up_spawn_timer <= 0 and entities.count_kind(*POWER_UPS) < 2:
+            self.spawn_power_up()
+            self.power_up_spawn_timer = random.randint(300, 600)
+
+        self.coil_spawn_timer -= 1
+        self.bomb_spawn_timer -= 1
+        self.power_up_spawn_timer -= 1
 
-def spawn_power_up():
-    power_up_type = random.choice(["speed_boost", "magnet", "x2"])
-    power_up_img = {"speed_boost": speed_boost_img, "magnet": magnet_img, "x2": x2_img}[power_up_type]
-    power_up_rect = power_up_img.get_rect(topleft=(SCREEN_WIDTH + random.randint(0, 400), random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT - 64)))
-    return power_up_type, power_up_img, power_up_rect, time.time()
+        self.background_x -= background_speed
+        if self.background_x <= -SCREEN_WIDTH:
+            self.background_x = 0
+            self.previous_background_x = self.background_x + background_speed
+
+        if self.score >= 5 and not self.boss_fight:
+            entities.clear()
+            self.boss_fight = True
 
 def boss_fight():
     boss_rect = boss_img.get_rect(center=(SCREEN_WIDTH - 150, SCREEN_HEIGHT // 2))
@@ -163,16 +242,17 @@ def boss_fight():
     shots_fired = 0
     shot_img = pygame.Surface((10, 10))
     shot_img.fill((255, 0, 0))
-    shot_rects = []
+    shots = EntityStore()
+    renderer = DirtyRenderer(screen, fill_color=(0, 105, 148))
     running = True
 
     while running:
         clock.tick(FPS)
-        screen.fill((0, 105, 148))
-        screen.blit(boss_img, boss_rect)
-        screen.blit(player_img, player_rect)
+        renderer.begin()
+        renderer.blit(boss_img, boss_rect)
+        renderer.blit(player_img, player_rect)
 
-        draw_text(f"Shots Fired: {shots_fired}/25", 36, (255, 255, 255), 10, 10)
+        renderer.blit(text_renderer.render(f"Shots Fired: {shots_fired}/25", 36, (255, 255, 255)), (10, 10))
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -181,59 +261,59 @@ def boss_fight():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     pause_menu()
+                    renderer.invalidate()
         
         keys = pygame.key.get_pressed()
         if keys[pygame.K_UP]:
             shot_rect = shot_img.get_rect(center=(player_rect.centerx + 50, player_rect.centery))
-            shot_rects.append(shot_rect)
+            shots.spawn(SHOT, shot_rect.x, shot_rect.y, shot_rect.width, shot_rect.height)
 
-        for shot in shot_rects:
-            shot.x += 10
-            if shot.colliderect(boss_rect):
-                shot_rects.remove(shot)
-                shots_fired += 1
-                if shots_fired >= 25:
-                    running = False
-            elif shot.x > SCREEN_WIDTH:
-                shot_rects.remove(shot)
+        shots.move(10)
+        hit = shots.collide(boss_rect)
+        shots_fired += int(hit.sum())
+        if shots_fired >= 25:
+            running = False
+        shots.remove(hit | shots.outside(right=SCREEN_WIDTH))
 
-        for shot in shot_rects:
-            screen.blit(shot_img, shot)
+        for _, position in shots.items():
+            renderer.blit(shot_img, position)
 
-        pygame.display.flip()
+        renderer.present()
 
 def game_loop(camera_index):
+    from models import model_manager
+    from motion_gate import MotionGate
+    from pipeline import DetectionPipeline
+    from propagate import DetectionScheduler
+    from session import open_session
+
     try:
-        model = YOLO("best.pt")
+        model = model_manager.get()
     except:
         pygame.quit()
         sys.exit()
 
-    cap = cv2.VideoCapture(camera_index)
+    cap, model, recorder, replay = open_session(camera_index, model, (SCREEN_WIDTH, SCREEN_HEIGHT))
     if not cap.isOpened():
         pygame.quit()
         sys.exit()
 
-    previous_positions = {}
-    target_labels = ["green", "blue", "orange"]
-    score = 0
-    coils = []
-    bombs = []
-    power_ups = []
-    speed_boost_active = False
-    magnet_active = False
-    x2_active = False
-    power_up_timer = 0
-    power_up_name = ""
-    background_x = 0
-    background_speed = 1
-    coil_spawn_timer = 0
-    bomb_spawn_timer = 0
-    power_up_spawn_timer = 0
-    in_boss_fight = False
-    running = True
-
-    while running:
+    timer, exporter = metrics_from_env()
+    overlay = StatsOverlay(timer, GAME_STAGES)
+    preview = CameraPreview(visible=bool(os.environ.get("PETRA_PREVIEW")))
+    pipeline = DetectionPipeline(cap, model, (SCREEN_WIDTH, SCREEN_HEIGHT), DetectionScheduler(DETECT_INTERVAL, adaptive=True), roi_from_env(), MotionGate(), recorder, timer, replay)
+    pipeline.start()
+
+    tracker = Tracker()
+    renderer = DirtyRenderer(screen, ScrollingBackground(background_img))
+    simulation = FixedTimestep(1.0 / SIM_HZ)
+    detection_events = deque()
+    preview_boxes = []
+    world = GameWorld(player_rect, entity_images)
+    player_control = 0
+    last_control_time = 0.0
+
+    while not world.game_over:
         clock.tick(FPS)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -242,134 +322,92 @@ def game_loop(camera_index):
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     pause_menu()
-
-        if in_boss_fight:
+                    simulation.reset()
+                    renderer.invalidate()
+                elif event.key == pygame.K_F3:
+                    overlay.toggle()
+                    renderer.invalidate()
+                elif event.key == pygame.K_F2:
+                    preview.toggle()
+                    renderer.invalidate()
+
+        if world.boss_fight:
             boss_fight()
-            in_boss_fight = False
+            simulation.reset()
+            detection_events.clear()
+            renderer.invalidate()
+            world.boss_fight = False
             continue
 
-        ret, frame = cap.read()
-        if not ret:
+        if pipeline.finished:
             break
 
-        frame = cv2.resize(frame, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        results = model(frame_rgb)
-        detections = results[0].boxes.data.tolist()
-        current_positions = {}
-        object_detected = False
-
-        for det in detections:
-            x1, y1, x2, y2, conf, cls = det
-            label = model.names[int(cls)]
-            if label in target_labels:
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                current_positions[int(cls)] = (center_x, center_y)
-                object_detected = True
-                if int(cls) in previous_positions:
-                    prev_x, prev_y = previous_positions[int(cls)]
-                    delta_y = center_y - prev_y
-                    if delta_y < -5:
-                        player_rect.y += player_speed
-                    elif delta_y > 5:
-                        player_rect.y -= player_speed
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36, 255, 12), 2)
-
-        if not object_detected:
-            player_rect.y -= player_speed * 2
-
-        previous_positions = current_positions.copy()
-        player_rect.y = max(SCREEN_HEIGHT // 4, min(player_rect.y, SCREEN_HEIGHT - player_rect.height))
-
-        for coil_rect in coils:
-            coil_rect.x -= player_speed
-            if player_rect.colliderect(coil_rect):
-                score += 2 if x2_active else 1
-                coils.remove(coil_rect)
-
-        for bomb_rect in bombs:
-            bomb_rect.x -= player_speed
-            if player_rect.colliderect(bomb_rect):
-                running = False
-
-        for power_up_type, power_up_img, power_up_rect, spawn_time in power_ups:
-            power_up_rect.x -= player_speed
-            if player_rect.colliderect(power_up_rect):
-                if power_up_type == "speed_boost":
-                    speed_boost_active = True
-                    power_up_name = "Speed Boost"
-                elif power_up_type == "magnet":
-                    magnet_active = True
-                    power_up_name = "Magnet"
-                elif power_up_type == "x2":
-                    x2_active = True
-                    power_up_name = "X2"
-                power_up_timer = 300
-                power_ups.remove((power_up_type, power_up_img, power_up_rect, spawn_time))
-
-        if power_up_timer > 0:
-            power_up_timer -= 1
-        else:
-            speed_boost_active = magnet_active = x2_active = False
-            power_up_name = ""
-
-        if coil_spawn_timer <= 0 and len(coils) < 5:
-            coils.append(spawn_coil())
-            coil_spawn_timer = random.randint(60, 180)
-
-        if bomb_spawn_timer <= 0 and len(bombs) < 3:
-            bombs.append(spawn_bomb())
-            bomb_spawn_timer = random.randint(120, 300)
-
-        if power_up_spawn_timer <= 0 and len(power_ups) < 2:
-            power_ups.append(spawn_power_up())
-            power_up_spawn_timer = random.randint(300, 600)
-
-        coil_spawn_timer -= 1
-        bomb_spawn_timer -= 1
-        power_up_spawn_timer -= 1
-
-        if score >= 5 and not in_boss_fight:
-            coils.clear()
-            bombs.clear()
-            power_ups.clear()
-            in_boss_fight = True
-
-        background_x -= background_speed
-        if background_x <= -SCREEN_WIDTH:
-            background_x = 0
-
-        screen.blit(background_img, (background_x, 0))
-        screen.blit(background_img, (background_x + SCREEN_WIDTH, 0))
-
-        for coil_rect in coils:
-            screen.blit(coil_img, coil_rect)
-
-        for power_up_type, power_up_img, power_up_rect, _ in power_ups:
-            screen.blit(power_up_img, power_up_rect)
-
-        for bomb_rect in bombs:
-            screen.blit(bomb_img, bomb_rect)
-
-        screen.blit(player_img, player_rect)
-        draw_text(f"Score: {score}", 36, (255, 255, 255), 10, 10)
-        if power_up_name:
-            draw_text(f"Power-Up: {power_up_name} - Timer: {power_up_timer//FPS} s", 36, (255, 255, 0), 10, 50)
-
-        pygame.display.flip()
-
+        # Detections are timestamped input events; each one is applied by the
+        # simulation step that covers the time its camera frame was captured.
+        result = pipeline.poll()
+        if result is not None:
+            detection_events.append(result)
+            # The frame is only valid until the next poll, so the preview takes it
+            # now, with the boxes from the last event the simulation applied.
+            preview.update(result.frame, preview_boxes)
+
+        # Game timers and speeds are in simulation steps of 1 / SIM_HZ seconds of
+        # wall-clock time, however slowly frames are rendered.
+        for step_time in simulation.steps():
+            while detection_events and detection_events[0].frame_timestamp <= step_time:
+                result = detection_events.popleft()
+                with timer.span("postprocess"):
+                    player_control, preview_boxes = steer(tracker.update(result.detections, result.frame_timestamp), model.names)
+                    last_control_time = result.frame_timestamp
+
+            with timer.span("simulation"):
+                if step_time - last_control_time > CONTROL_TIMEOUT:
+                    player_control = 0
+
+                world.step(player_control)
+
+            if world.game_over or world.boss_fight:
+                break
+
+        with timer.span("render"):
+            alpha = simulation.alpha
+            renderer.begin(round(lerp(world.previous_background_x, world.background_x, alpha)))
+
+            for kind, position in world.entities.items(alpha):
+                renderer.blit(entity_images[kind], position)
+
+            renderer.blit(player_img, (player_rect.x, round(lerp(world.previous_player_y, player_rect.y, alpha))))
+            renderer.blit(text_renderer.render(f"Score: {world.score}", 36, (255, 255, 255)), (10, 10))
+            if world.power_up_name:
+                renderer.blit(text_renderer.render(f"Power-Up: {world.power_up_name} - Timer: {world.power_up_timer // SIM_HZ} s", 36, (255, 255, 0)), (10, 50))
+            overlay.draw(renderer.blit, (SCREEN_WIDTH - 220, 10))
+            preview.draw(renderer.blit, (SCREEN_WIDTH - preview.size[0] - 10, SCREEN_HEIGHT - preview.size[1] - 10))
+
+        with timer.span("present"):
+            renderer.present()
+
+        if timer.enabled:
+            timer.frame()
+            timer.count("dropped_frames", pipeline.frames.dropped)
+            timer.count("dropped_results", pipeline.results.dropped)
+            if exporter is not None:
+                exporter.maybe_export()
+
+    pipeline.stop()
     cap.release()
-    if game_over_screen(score):
+    print(f"Pipeline: {pipeline.stats()}")
+    if exporter is not None:
+        exporter.export()
+    render_stats = renderer.stats()
+    print(f"Render: {render_stats['avg_render_ms']:.2f} ms/frame, {render_stats['avg_blit_area'] / (SCREEN_WIDTH * SCREEN_HEIGHT):.2f} screens blitted/frame")
+    if game_over_screen(world.score):
         main()
     else:
         pygame.quit()
 
 def main():
     start_menu()
-    camera_index = 0
+    camera_index = loader.results["camera"]
     if camera_index == -1:
         pygame.quit()
         sys.exit()
@@ -377,4 +415,6 @@ def main():
     while True:
         game_loop(camera_index)
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    loader.start()
+    main()
\ No newline at end of file
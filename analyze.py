@@ -0,0 +1,200 @@
+import argparse
+import csv
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+COLUMNS = ["frame", "time_s", "balls", "detections", "grid_speed", "patient_class", "cc_per_sec", "peak_flow"]
+
+# Offline version of main.py for recorded sessions: every file is analysed in
+# its own worker process (one model per process), frames are decoded on a
+# background thread and inferred in batches, and one row per frame is written.
+
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+
+def output_names(videos):
+    # Each video's path below the directory all inputs share, without extension,
+    # so sessions/<ts>/frames.avi files do not all write frames.csv.
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(video)) for video in videos])
+    return [os.path.splitext(os.path.relpath(os.path.abspath(video), root))[0] for video in videos]
+
+
+class FrameReader(threading.Thread):
+    # Decodes ahead of inference into a bounded queue; unlike the live pipeline
+    # no frame is ever dropped. None marks the end of the file.
+    def __init__(self, path, size, depth=64):
+        super().__init__(daemon=True)
+        self.path = path
+        self.size = size
+        self.frames = queue.Queue(maxsize=depth)
+        self.fps = None
+        self.error = None
+
+    def run(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.path)
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        decoded = 0
+        try:
+            if not cap.isOpened():
+                self.error = f"cannot open {self.path}"
+                return
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                decoded += 1
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size)
+                self.frames.put(frame)
+            if not decoded:
+                self.error = f"no frame could be decoded from {self.path}"
+        finally:
+            cap.release()
+            self.frames.put(None)
+
+    def batches(self, batch_size):
+        batch = []
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                break
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def format_detections(detections):
+    return ";".join(" ".join(f"{value:.1f}" for value in row[:5]) + f" {int(row[5])}" for row in detections)
+
+
+def write_rows(rows, path, fmt):
+    if fmt == "parquet":
+        import pandas as pd
+
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+_detector = None
+
+
+def _init_worker(options, threads):
+    # Runs once per worker process: cap library threads so N workers share the
+    # cores instead of each trying to use all of them, then load the model once.
+    global _detector
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    import cv2
+
+    cv2.setNumThreads(threads)
+    from detectors import load_detector
+
+    _detector = load_detector(options["detector"], options["backend"], options["weights"], options["imgsz"], input_format="bgr")
+    if options["backend"] == "torch" and options["detector"] != "color":
+        import torch
+
+        torch.set_num_threads(threads)
+
+
+def analyze_file(path, out_path, fmt="csv", batch_size=8, size=(640, 480)):
+    from peak_flow import FlowAnalyzer
+
+    start = time.time()
+    reader = FrameReader(path, size, depth=batch_size * 4)
+    reader.start()
+    analyzer = FlowAnalyzer(size)
+    predict_batch = getattr(_detector, "predict_batch", None)
+    rows = []
+    for batch in reader.batches(batch_size):
+        outputs = predict_batch(batch) if predict_batch else [_detector.predict(frame) for frame in batch]
+        for detections in outputs:
+            index = len(rows)
+            row = analyzer.update(detections)
+            row.update(frame=index, time_s=index / reader.fps, detections=format_detections(detections))
+            rows.append(row)
+    reader.join()
+    if reader.error:
+        # Raised so main() counts the file as failed instead of writing an empty table.
+        raise ValueError(reader.error)
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    write_rows(rows, out_path, fmt)
+    elapsed = time.time() - start
+    return {"video": path, "output": out_path, "frames": len(rows), "seconds": elapsed, "patient_class": analyzer.patient_class, "peak_flow": analyzer.flow_stats.peak_flow}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse recorded sessions offline and write per-frame flow results")
+    parser.add_argument("inputs", nargs="+", help="video files or directories")
+    parser.add_argument("--output", default="analysis")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--threads", type=int, default=None, help="library threads per worker (default: cores / workers)")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--detector", default=os.environ.get("PETRA_DETECTOR", "yolo"))
+    parser.add_argument("--backend", default=os.environ.get("PETRA_BACKEND", "torch"))
+    parser.add_argument("--weights", default=None)
+    parser.add_argument("--imgsz", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("No videos found.")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    workers = min(args.workers, len(videos))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    options = {"detector": args.detector, "backend": args.backend, "weights": args.weights, "imgsz": args.imgsz}
+
+    start = time.time()
+    total_frames = 0
+    failed = 0
+    out_paths = [os.path.join(args.output, f"{name}.{args.format}") for name in output_names(videos)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options, threads)) as pool:
+        futures = [pool.submit(analyze_file, video, out_path, args.format, args.batch) for video, out_path in zip(videos, out_paths)]
+        for video, future in zip(videos, futures):
+            # One unreadable file should not cost the results of the others.
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"{video}: failed ({e})")
+                continue
+            total_frames += result["frames"]
+            print(f"{result['video']}: {result['frames']} frames, {result['frames'] / result['seconds']:.1f} FPS, "
+                  f"class {result['patient_class']}, peak flow {result['peak_flow']:.2f} -> {result['output']}")
+    elapsed = time.time() - start
+    cores = workers * threads
+    print(f"{len(videos)} files, {total_frames} frames in {elapsed:.1f} s: {total_frames / elapsed:.1f} FPS total, "
+          f"{total_frames / elapsed / cores:.1f} FPS per core ({workers} workers x {threads} threads)")
+    if failed:
+        print(f"{failed} of {len(videos)} files failed.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pygame
+
+player_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/f2.png?alt=media&token=a01aa678-4437-4408-8479-e69ddb05c7f3"
+coil_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/image.png?alt=media&token=e7cd5083-7d87-466b-9296-8d171014f6be"
+background_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/DALLE_2024-10-02_11.02.21_-_A_cartoon-style_background_image_resembling_an_underwater_scene_with_light_aqua-green_tones._The_top_section_has_simplified_exaggerated_wave_patterns.webp?alt=media&token=f290632a-10ad-461e-9622-7ed49ccc7999"
+speed_boost_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/images%20(1).jpg?alt=media&token=a5f1cf23-fda6-4cc9-a7c6-6c4eadcd3c21"
+magnet_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/images.jpg?alt=media&token=b9ac4fdd-b44e-497a-a4da-1e5d47eb624b"
+x2_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/x2-3d-rendering-on-white-260nw-1467989987%20(1).webp?alt=media&token=176b3b0a-2573-44bf-bb48-9d48fea098ac"
+bomb_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/depositphotos_3622851-stock-photo-bomb.jpg?alt=media&token=5c0ed80f-d133-4ecc-ba8b-2dfd2b343fdb"
+boss_image_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/image-removebg-preview%20(63).png?alt=media&token=d83eab77-3b43-49e4-8a12-1906986e2e72"
+
+SCREEN_SIZE = (800, 600)
+
+NEW_GAME_ASSETS = {
+    "player": (player_url, (128, 128)),
+    "coil": (coil_url, (64, 64)),
+    "background": (background_url, SCREEN_SIZE),
+    "speed_boost": (speed_boost_url, (64, 64)),
+    "magnet": (magnet_url, (64, 64)),
+    "x2": (x2_url, (64, 64)),
+    "bomb": (bomb_url, (64, 64)),
+    "boss": (boss_image_url, (200, 200)),
+}
+
+GAME_ASSETS = {
+    "player": (player_url, (64, 64)),
+    "coil": (coil_url, (32, 32)),
+    "background": (background_url, SCREEN_SIZE),
+}
+
+# Sprite sets packed into one atlas each by `python assets.py build`.
+ATLASES = {"new_game": NEW_GAME_ASSETS, "game": GAME_ASSETS}
+
+# Per user, like the camera cache: next to this file would be PyInstaller's
+# temporary unpack folder in the one-file build, emptied on every exit.
+CACHE_DIR = os.environ.get("PETRA_ASSET_CACHE", os.path.join(os.path.expanduser("~"), ".petra_assets"))
+
+
+def display_format(image):
+    # Match the display's pixel format so blits skip per-pixel conversion; only
+    # images that actually carry per-pixel alpha keep an alpha channel.
+    if not pygame.display.get_surface():
+        return image
+    if image.get_flags() & pygame.SRCALPHA or image.get_colorkey() is not None:
+        return image.convert_alpha()
+    return image.convert()
+
+
+def pack(sizes, width=None):
+    # Shelf packing, tallest first, in rows as wide as the widest sprite unless
+    # `width` is larger. Returns {name: (x, y)} and the atlas size.
+    width = max([width or 0] + [w for w, _ in sizes.values()])
+    positions = {}
+    x = y = shelf = 0
+    for name in sorted(sizes, key=lambda name: -sizes[name][1]):
+        w, h = sizes[name]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        positions[name] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, (width, y + shelf)
+
+
+class AssetCache:
+    # Decoded, pre-scaled images stored as PNG under a hash of URL + size, so a
+    # launch with a warm cache never touches the network.
+    def __init__(self, cache_dir=CACHE_DIR, offline=None, timeout=10, workers=8):
+        self.cache_dir = cache_dir
+        self.offline = os.environ.get("PETRA_OFFLINE") == "1" if offline is None else offline
+        self.timeout = timeout
+        self.workers = workers
+        self._loaded = {}
+        self._atlases = {}
+
+    def path(self, url, size=None):
+        key = f"{url}|{size[0]}x{size[1]}" if size else url
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+    def missing(self, assets):
+        return {name: entry for name, entry in assets.items() if not os.path.exists(self.path(*entry))}
+
+    def _fetch(self, url, size):
+        import requests
+
+        response = requests.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        image = pygame.image.load(BytesIO(response.content))
+        if size:
+            image = pygame.transform.scale(image, size)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(url, size)
+        tmp_path = path + ".tmp"
+        pygame.image.save(image, tmp_path, "png")
+        os.replace(tmp_path, path)
+        return path
+
+    def fetch_missing(self, assets, atlas=None):
+        if atlas and self.atlas_index(atlas, assets) is not None:
+            return
+        missing = self.missing(assets)
+        if not missing:
+            return
+        if self.offline:
+            raise FileNotFoundError(f"Offline and not cached: {', '.join(sorted(missing))}")
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+            list(pool.map(lambda entry: self._fetch(*entry), missing.values()))
+
+    def load(self, url, size=None):
+        key = (url, size)
+        if key not in self._loaded:
+            self.fetch_missing({url: (url, size)})
+            self._loaded[key] = display_format(pygame.image.load(self.path(url, size)))
+        return self._loaded[key]
+
+    def load_all(self, assets, atlas=None):
+        # From the named atlas when one was built for exactly these assets,
+        # otherwise one cached PNG per asset.
+        if atlas:
+            images = self.load_atlas(atlas, assets)
+            if images is not None:
+                return images
+        self.fetch_missing(assets)
+        return {name: self.load(url, size) for name, (url, size) in assets.items()}
+
+    def atlas_path(self, name, extension):
+        return os.path.join(self.cache_dir, f"{name}.atlas.{extension}")
+
+    def atlas_index(self, name, assets):
+        try:
+            with open(self.atlas_path(name, "json")) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        sources = {key: [url, list(size) if size else None] for key, (url, size) in assets.items()}
+        if index.get("sources") != sources:
+            return None
+        # A truncated or foreign pixel file would make frombuffer fail; the
+        # per-asset PNGs are used instead.
+        width, height = index["size"]
+        try:
+            if os.path.getsize(self.atlas_path(name, "raw")) != width * height * 4:
+                return None
+        except OSError:
+            return None
+        return index
+
+    def build_atlas(self, name, assets):
+        # All sprites at their final size in one uncompressed RGBA image, plus an
+        # index of their rectangles, so loading is a memory map instead of a
+        # decode. (A PNG atlas decoded slower than the separate PNGs.)
+        self.fetch_missing(assets)
+        images = {key: pygame.image.load(self.path(url, size)) for key, (url, size) in assets.items()}
+        positions, atlas_size = pack({key: image.get_size() for key, image in images.items()})
+        atlas = pygame.Surface(atlas_size, pygame.SRCALPHA, 32)
+        sprites = {}
+        for key, image in images.items():
+            # MAX onto a zeroed atlas copies the pixels, alpha included, without blending.
+            atlas.blit(image, positions[key], special_flags=pygame.BLEND_RGBA_MAX)
+            sprites[key] = {"rect": [*positions[key], *image.get_size()], "alpha": bool(image.get_flags() & pygame.SRCALPHA)}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        raw_path = self.atlas_path(name, "raw")
+        with open(raw_path + ".tmp", "wb") as f:
+            f.write(pygame.image.tobytes(atlas, "RGBA"))
+        os.replace(raw_path + ".tmp", raw_path)
+        # The index goes last: without it the atlas is not used.
+        index = {
+            "size": list(atlas_size),
+            "sprites": sprites,
+            "sources": {key: [url, list(size) if size else None] for key, (url, size) in assets.items()},
+        }
+        index_path = self.atlas_path(name, "json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(index_path + ".tmp", index_path)
+        return index
+
+    def load_atlas(self, name, assets):
+        # A memory map of the atlas pixels, one conversion to the display
+        # format, then a subsurface per sprite. Returns None when there is no
+        # usable atlas for these assets.
+        if name in self._atlases:
+            return self._atlases[name]
+        index = self.atlas_index(name, assets)
+        if index is None:
+            return None
+        size = tuple(index["size"])
+        with open(self.atlas_path(name, "raw"), "rb") as f:
+            pixels = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(pixels) != size[0] * size[1] * 4:
+            # Rewritten since the index was read.
+            return None
+        atlas = pygame.image.frombuffer(pixels, size, "RGBA")
+        display = pygame.display.get_surface() is not None
+        if display:
+            atlas = atlas.convert_alpha()
+        images = {}
+        for key, sprite in index["sprites"].items():
+            image = atlas.subsurface(sprite["rect"])
+            # Opaque sprites get their own display-format copy so their blits skip alpha blending.
+            images[key] = image.convert() if display and not sprite["alpha"] else image
+        self._atlases[name] = images
+        return images
+
+
+asset_cache = AssetCache()
+
+
+def load_image(url, size=None):
+    return asset_cache.load(url, size)
+
+
+def build_bundle(cache_dir=CACHE_DIR):
+    cache = AssetCache(cache_dir, offline=False)
+    for name, assets in ATLASES.items():
+        missing = cache.missing(assets)
+        cache.fetch_missing(assets)
+        index = cache.build_atlas(name, assets)
+        print(f"{name}: {len(assets) - len(missing)} cached, {len(missing)} fetched, atlas {index['size'][0]}x{index['size'][1]}")
+    print(f"Asset bundle ready in {cache_dir}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "build":
+        print("Usage: python assets.py build [cache_dir]")
+        sys.exit(1)
+    build_bundle(args[1] if len(args) > 1 else CACHE_DIR)
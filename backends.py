@@ -0,0 +1,287 @@
+import argparse
+import ast
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Every backend returns detections as an (N, 6) float32 array of
+# [x1, y1, x2, y2, conf, cls] in the coordinates of the image it was given,
+# plus a `names` dict mapping class id to label, which is what the game loops use.
+
+DEFAULT_IMGSZ = 640
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+
+
+class Letterbox:
+    # Resize keeping aspect ratio and pad to imgsz x imgsz into a canvas that is
+    # reused between frames; geometry is only recomputed when the input shape changes.
+    def __init__(self, imgsz, color=(114, 114, 114)):
+        self.imgsz = imgsz
+        self.color = color
+        self._shape = None
+
+    def _prepare(self, shape):
+        height, width = shape[:2]
+        self.scale = min(self.imgsz / height, self.imgsz / width)
+        self.new_size = (int(round(width * self.scale)), int(round(height * self.scale)))
+        self.pad = ((self.imgsz - self.new_size[0]) // 2, (self.imgsz - self.new_size[1]) // 2)
+        if self._shape is None or self._shape[2] != shape[2]:
+            self.canvas = np.empty((self.imgsz, self.imgsz, shape[2]), dtype=np.uint8)
+        self.canvas[:] = self.color[:shape[2]]
+        self._resized = np.empty((self.new_size[1], self.new_size[0], shape[2]), dtype=np.uint8)
+        self._shape = shape
+
+    def __call__(self, image):
+        # Returns the padded image, the scale and the (left, top) padding needed to map boxes back.
+        if image.shape != self._shape:
+            self._prepare(image.shape)
+        left, top = self.pad
+        width, height = self.new_size
+        if (width, height) != (image.shape[1], image.shape[0]):
+            cv2.resize(image, self.new_size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+            self.canvas[top:top + height, left:left + width] = self._resized
+        else:
+            self.canvas[top:top + height, left:left + width] = image
+        return self.canvas, self.scale, self.pad
+
+
+def unletterbox(detections, scale, pad, shape):
+    if not len(detections):
+        return detections
+    detections[:, [0, 2]] = (detections[:, [0, 2]] - pad[0]) / scale
+    detections[:, [1, 3]] = (detections[:, [1, 3]] - pad[1]) / scale
+    detections[:, [0, 2]] = detections[:, [0, 2]].clip(0, shape[1])
+    detections[:, [1, 3]] = detections[:, [1, 3]].clip(0, shape[0])
+    return detections
+
+
+def postprocess(output, conf_threshold=CONF_THRESHOLD, iou_threshold=IOU_THRESHOLD):
+    output = np.asarray(output)[0]
+    if output.ndim == 2 and output.shape[1] == 6:
+        # YOLOv10 end-to-end head: already [x1, y1, x2, y2, score, cls] without NMS.
+        return output[output[:, 4] >= conf_threshold].astype(np.float32)
+
+    # YOLOv8-style head: (4 + num_classes, anchors) of cx, cy, w, h and class scores.
+    output = output.T
+    scores = output[:, 4:]
+    classes = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), classes]
+    keep = conf >= conf_threshold
+    boxes, conf, classes = output[keep, :4], conf[keep], classes[keep]
+    if not len(boxes):
+        return np.zeros((0, 6), dtype=np.float32)
+    xyxy = np.concatenate((boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2), axis=1)
+    # Offset boxes per class so a single NMS call never suppresses across classes.
+    offset = xyxy + classes[:, None] * 4096.0
+    nms_boxes = np.concatenate((offset[:, :2], offset[:, 2:] - offset[:, :2]), axis=1)
+    indices = np.asarray(cv2.dnn.NMSBoxes(nms_boxes.tolist(), conf.tolist(), conf_threshold, iou_threshold), dtype=int).reshape(-1)
+    return np.concatenate((xyxy[indices], conf[indices, None], classes[indices, None]), axis=1).astype(np.float32)
+
+
+class Backend:
+    # Letterboxes once per frame to the backend's own input size, which is set
+    # independently of the display size, and maps boxes back to the input image.
+    name = None
+    imgsz = DEFAULT_IMGSZ
+
+    def predict(self, image):
+        padded, scale, pad = self.letterbox(image)
+        return unletterbox(self.infer(padded), scale, pad, image.shape)
+
+    def predict_batch(self, images):
+        # One inference call for several images (e.g. one per camera); returns one
+        # detections array per image. Each slot keeps its own letterbox canvas.
+        if not hasattr(self, "letterboxes"):
+            self.letterboxes = []
+        while len(self.letterboxes) < len(images):
+            self.letterboxes.append(Letterbox(self.imgsz))
+        padded = [letterbox(image) for letterbox, image in zip(self.letterboxes, images)]
+        outputs = self.infer_batch([canvas for canvas, _, _ in padded])
+        return [unletterbox(output, scale, pad, image.shape) for output, (_, scale, pad), image in zip(outputs, padded, images)]
+
+    def infer_batch(self, padded):
+        return [self.infer(canvas) for canvas in padded]
+
+
+class TorchBackend(Backend):
+    name = "torch"
+
+    def __init__(self, path="best.pt", imgsz=None):
+        from ultralytics import YOLO
+
+        self.model = YOLO(path)
+        self.names = self.model.names
+        self.imgsz = imgsz or DEFAULT_IMGSZ
+        self.letterbox = Letterbox(self.imgsz)
+
+    def infer(self, padded):
+        return self.model(padded, imgsz=self.imgsz, verbose=False)[0].boxes.data.cpu().numpy().astype(np.float32, copy=False)
+
+    def infer_batch(self, padded):
+        return [result.boxes.data.cpu().numpy().astype(np.float32, copy=False) for result in self.model(list(padded), imgsz=self.imgsz, verbose=False)]
+
+
+class ExportedBackend(Backend):
+    # Shared pre/post-processing for fixed-size exported models. Input follows the
+    # ultralytics convention for numpy images so results match TorchBackend.
+    batch_size = 1
+
+    def infer(self, padded):
+        # The input blob is allocated once and refilled in place every frame.
+        if getattr(self, "blob", None) is None or self.blob.shape[2:] != padded.shape[:2]:
+            self.blob = np.empty((1, 3) + padded.shape[:2], dtype=np.float32)
+        np.divide(padded[:, :, ::-1].transpose(2, 0, 1), 255.0, out=self.blob[0])
+        return postprocess(self.run(self.blob))
+
+    def infer_batch(self, padded):
+        # Only models exported with a dynamic batch dimension (batch_size None)
+        # take the whole stack in one call; fixed batch-1 exports run one by one.
+        if self.batch_size == 1:
+            return [self.infer(canvas) for canvas in padded]
+        blob = np.ascontiguousarray(np.stack(padded)[:, :, :, ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        output = self.run(blob)
+        return [postprocess(output[i:i + 1]) for i in range(len(padded))]
+
+
+class OnnxBackend(ExportedBackend):
+    name = "onnx"
+
+    def __init__(self, path="best.onnx", imgsz=None, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        input_shape = self.session.get_inputs()[0].shape
+        # Fixed-size exports dictate their input size; imgsz only applies to dynamic ones.
+        self.imgsz = input_shape[2] if isinstance(input_shape[2], int) else imgsz or DEFAULT_IMGSZ
+        self.batch_size = input_shape[0] if isinstance(input_shape[0], int) else None
+        self.letterbox = Letterbox(self.imgsz)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    name = "openvino"
+
+    def __init__(self, path="best_openvino_model", imgsz=None):
+        import openvino as ov
+
+        if os.path.isdir(path):
+            path = os.path.join(path, "best.xml")
+        core = ov.Core()
+        model = core.read_model(path)
+        self.compiled = core.compile_model(model, "CPU")
+        batch, _, height, _ = model.inputs[0].get_partial_shape()
+        self.imgsz = height.get_length() if height.is_static else imgsz or DEFAULT_IMGSZ
+        self.batch_size = batch.get_length() if batch.is_static else None
+        self.letterbox = Letterbox(self.imgsz)
+        self.names = {}
+        metadata_path = os.path.join(os.path.dirname(path), "metadata.yaml")
+        if os.path.exists(metadata_path):
+            import yaml
+
+            with open(metadata_path) as f:
+                self.names = yaml.safe_load(f).get("names", {})
+
+    def run(self, blob):
+        return self.compiled(blob)[self.compiled.output(0)]
+
+
+BACKENDS = {
+    "torch": (TorchBackend, "best.pt"),
+    "onnx": (OnnxBackend, "best.onnx"),
+    "openvino": (OpenVinoBackend, "best_openvino_model"),
+}
+
+
+def load_backend(name="torch", path=None, imgsz=None):
+    backend_class, default_path = BACKENDS[name]
+    return backend_class(path or default_path, imgsz=imgsz)
+
+
+def export(path="best.pt", format="onnx", imgsz=DEFAULT_IMGSZ, dynamic=False):
+    # dynamic=True exports a variable batch (and input) size, needed for batched
+    # multi-camera inference; fixed-size exports are slightly faster per frame.
+    from ultralytics import YOLO
+
+    return YOLO(path).export(format=format, imgsz=imgsz, dynamic=dynamic, simplify=format == "onnx")
+
+
+def match_rate(reference, candidate, iou_threshold=0.5):
+    # Fraction of reference detections that have a same-class candidate with IoU >= threshold.
+    from tracker import iou_matrix
+
+    if not len(reference):
+        return 1.0 if not len(candidate) else 0.0
+    if not len(candidate):
+        return 0.0
+    iou = iou_matrix(reference[:, :4], candidate[:, :4])
+    iou[reference[:, 5][:, None] != candidate[:, 5][None, :]] = 0
+    return float((iou.max(axis=1) >= iou_threshold).mean())
+
+
+def compare(video, backends, frames=300, size=(800, 600)):
+    cap = cv2.VideoCapture(video)
+    latencies = {backend.name: [] for backend in backends}
+    agreement = {backend.name: [] for backend in backends[1:]}
+    count = 0
+    while count < frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_rgb = cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB)
+        outputs = []
+        for backend in backends:
+            start = time.perf_counter()
+            outputs.append(backend.predict(frame_rgb))
+            latencies[backend.name].append((time.perf_counter() - start) * 1000)
+        for backend, output in zip(backends[1:], outputs[1:]):
+            agreement[backend.name].append((match_rate(outputs[0], output) + match_rate(output, outputs[0])) / 2)
+        count += 1
+    cap.release()
+
+    print(f"{count} frames from {video}")
+    for backend in backends:
+        values = np.array(latencies[backend.name][1:] or latencies[backend.name])
+        line = f"{backend.name:>9}: mean {values.mean():7.1f} ms  p50 {np.percentile(values, 50):7.1f} ms  p95 {np.percentile(values, 95):7.1f} ms"
+        if backend.name in agreement:
+            line += f"  agreement vs {backends[0].name} {np.mean(agreement[backend.name]) * 100:5.1f}%"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export best.pt and compare CPU inference backends")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("--weights", default="best.pt")
+    export_parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    export_parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    export_parser.add_argument("--dynamic", action="store_true", help="variable batch size, for multicam.py")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("video")
+    compare_parser.add_argument("--backends", default="torch,onnx", help="comma separated; the first is the reference")
+    compare_parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    compare_parser.add_argument("--frames", type=int, default=300)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        print(export(args.weights, args.format, args.imgsz, args.dynamic))
+    else:
+        backends = [load_backend(name, imgsz=args.imgsz) for name in args.backends.split(",")]
+        compare(args.video, backends, args.frames)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import os
+
+# No window and no audio device: everything is drawn to SDL's dummy driver.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import pygame
+
+from assets import asset_cache, NEW_GAME_ASSETS, SCREEN_SIZE
+from detectors import DETECTORS, load_detector
+from entities import COIL, BOMB, POWER_UPS
+from hud import text_renderer
+from motion_gate import MotionGate
+from NewGame import DETECT_INTERVAL, GameWorld, SIM_HZ, steer
+from peak_flow import PeakFlowStats, SpeedClassifier, centroids, grid_speeds
+from pipeline import CaptureThread, InferenceWorker
+from propagate import DetectionScheduler
+from render import DirtyRenderer, ScrollingBackground
+from roi import RoiSelector
+from timestep import FixedTimestep, lerp
+from timing import StageTimer
+from tracker import Tracker
+
+# Drives the per-frame work of NewGame.game_loop and main.py from a video file,
+# synchronously, so every stage can be timed on its own. The game runs the
+# pipeline's own detection path (scheduler, propagation, motion gate and, if
+# asked for, the crop) and NewGame's own control and simulation step, with the fixed timestep fed video time instead
+# of wall-clock time, so a 30 FPS video gives one step per frame; there is no
+# frame pacing.
+
+STAGES = ["capture", "resize", "convert", "inference", "propagate", "postprocess", "simulation", "render"]
+
+
+def load_images():
+    try:
+        return asset_cache.load_all(NEW_GAME_ASSETS, "new_game")
+    except Exception as e:
+        # Blit cost depends on size and format, not on the artwork.
+        print(f"Assets not cached ({e}); using placeholder sprites")
+        images = {}
+        for name, (_, size) in NEW_GAME_ASSETS.items():
+            images[name] = pygame.Surface(size).convert()
+            images[name].fill((random.randrange(256), random.randrange(256), random.randrange(256)))
+        return images
+
+
+def detection_worker(model, timer, propagate=True, gate=True, roi=False):
+    # The game's InferenceWorker, called synchronously; the options switch off
+    # what NewGame.game_loop uses, to measure what each part saves.
+    scheduler = DetectionScheduler(DETECT_INTERVAL, adaptive=True) if propagate else None
+    return InferenceWorker(model, None, None, scheduler, RoiSelector() if roi else None, MotionGate() if gate else None, timer=timer)
+
+
+def run_game(cap, worker, timer, frames, allocations=None):
+    width, height = SCREEN_SIZE
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    images = load_images()
+    entity_images = {COIL: images["coil"], BOMB: images["bomb"]}
+    entity_images.update({kind: images[name] for kind, name in POWER_UPS.items()})
+
+    renderer = DirtyRenderer(screen, ScrollingBackground(images["background"]))
+    tracker = Tracker()
+    player_img = images["player"]
+    world = GameWorld(player_img.get_rect(center=(width // 4, height // 2)), entity_images)
+    simulation = FixedTimestep(1.0 / SIM_HZ)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    # The game's capture path (pooled buffers), driven synchronously instead of on its thread.
+    capture = CaptureThread(cap, SCREEN_SIZE, None, timer=timer)
+    raw = None
+    count = 0
+
+    while count < frames:
+        if allocations is not None:
+            tracemalloc.reset_peak()
+            allocated = tracemalloc.get_traced_memory()[0]
+        frame, raw = capture.grab(raw)
+        if frame is None:
+            break
+        timestamp = count / fps
+        # Times its own inference and propagate stages.
+        detections = worker.handle(frame).detections
+
+        with timer.span("postprocess"):
+            player_control, _ = steer(tracker.update(detections, timestamp), worker.model.names)
+
+        with timer.span("simulation"):
+            for _ in simulation.steps(timestamp):
+                world.step(player_control)
+                if world.game_over or world.boss_fight:
+                    # The game shows the game-over screen or the interactive boss
+                    # fight here; the benchmark starts a fresh round instead.
+                    world = GameWorld(player_img.get_rect(center=(width // 4, height // 2)), entity_images)
+                    break
+
+        with timer.span("render"):
+            pygame.event.pump()
+            alpha = simulation.alpha
+            renderer.begin(round(lerp(world.previous_background_x, world.background_x, alpha)))
+            for kind, position in world.entities.items(alpha):
+                renderer.blit(entity_images[kind], position)
+            renderer.blit(player_img, (world.player_rect.x, round(lerp(world.previous_player_y, world.player_rect.y, alpha))))
+            renderer.blit(text_renderer.render(f"Score: {world.score}", 36, (255, 255, 255)), (10, 10))
+            if world.power_up_name:
+                renderer.blit(text_renderer.render(f"Power-Up: {world.power_up_name} - Timer: {world.power_up_timer // SIM_HZ} s", 36, (255, 255, 0)), (10, 50))
+            renderer.present()
+        frame.release()
+        if allocations is not None:
+            allocations.append(tracemalloc.get_traced_memory()[1] - allocated)
+        count += 1
+    return count
+
+
+def run_analysis(cap, model, timer, frames, grid_size=15, size=(640, 480)):
+    frame_width, frame_height = size
+    square_width, square_height = frame_width // grid_size, frame_height // grid_size
+    flow_stats = PeakFlowStats()
+    speed_classifier = SpeedClassifier({"Low": (0, 1), "Medium": (1, 2), "High": (2, 3)})
+    previous_positions = np.zeros((0, 2), dtype=np.int32)
+    last_patient_class = "N/A"
+    count = 0
+
+    while count < frames:
+        with timer.span("capture"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        with timer.span("resize"):
+            if (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size)
+        with timer.span("inference"):
+            detections = model.predict(frame)
+
+        with timer.span("postprocess"):
+            current_positions = centroids(detections[:, :4])
+            speeds = grid_speeds(current_positions, previous_positions, square_width, square_height)
+            flow_stats.add_speeds(speeds)
+            patient_class = speed_classifier.last_label(speeds)
+            last_patient_class = patient_class if patient_class != "N/A" else last_patient_class
+            previous_positions = current_positions
+
+        with timer.span("render"):
+            for i in range(1, grid_size):
+                cv2.line(frame, (0, i * square_height), (frame_width, i * square_height), (255, 255, 255), 1)
+                cv2.line(frame, (i * square_width, 0), (i * square_width, frame_height), (255, 255, 255), 1)
+            for x1, y1, x2, y2 in detections[:, :4].astype(int):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, f"Patient Class: {last_patient_class}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            cv2.putText(frame, f"CC/sec: {len(detections) * 600}", (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            cv2.putText(frame, f"Peak Flow: {flow_stats.peak_flow:.2f}", (50, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+        count += 1
+    return count
+
+
+def benchmark(video, mode="game", backend="torch", weights=None, imgsz=None, frames=1000, seed=0, model=None, detector="yolo", allocations=False, propagate=True, gate=True, roi=False):
+    random.seed(seed)
+    np.random.seed(seed)
+    if model is None:
+        # main.py feeds BGR frames, the game loop RGB.
+        model = load_detector(detector, backend, weights, imgsz, "bgr" if mode == "analysis" else "rgb")
+    # Warm-up outside the measurement, as ModelManager does at startup.
+    model.predict(np.zeros((SCREEN_SIZE[1], SCREEN_SIZE[0], 3), dtype=np.uint8))
+
+    pygame.init()
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {video}")
+    timer = StageTimer()
+    # Peak bytes held above the frame's starting point, per game frame. Tracing
+    # slows everything down, so timings from such a run are not comparable.
+    frame_allocations = [] if allocations and mode == "game" else None
+    if frame_allocations is not None:
+        tracemalloc.start()
+    worker = detection_worker(model, timer, propagate, gate, roi) if mode == "game" else None
+    start = time.perf_counter()
+    try:
+        if mode == "game":
+            count = run_game(cap, worker, timer, frames, frame_allocations)
+        else:
+            count = run_analysis(cap, model, timer, frames)
+    finally:
+        cap.release()
+        pygame.quit()
+        tracemalloc.stop()
+    wall = time.perf_counter() - start
+
+    result = {
+        "mode": mode,
+        "video": os.path.abspath(video),
+        "backend": getattr(model, "name", backend),
+        "imgsz": getattr(model, "imgsz", imgsz),
+        "frames": count,
+        "wall_s": wall,
+        "fps": count / wall if wall else 0.0,
+        "stages": {stage: stats for stage, stats in sorted(timer.summary().items(), key=lambda item: STAGES.index(item[0]))},
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if worker is not None:
+        result["detection"] = worker.stats()
+    if frame_allocations:
+        # The first frames fill the pools; steady state is what matters.
+        steady = np.array(frame_allocations[min(10, len(frame_allocations) - 1):]) / 1024
+        result["allocated_kb_per_frame"] = {"mean": float(steady.mean()), "p95": float(np.percentile(steady, 95)), "max": float(steady.max())}
+    return result
+
+
+def print_report(result, baseline=None):
+    print(f"{result['mode']} / {result['backend']} @ {result['imgsz']}: {result['frames']} frames in {result['wall_s']:.2f} s ({result['fps']:.1f} FPS)")
+    header = f"{'stage':>12} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline:
+        header += f" {'p50 vs base':>12} {'p95 vs base':>12}"
+    print(header + "  (ms)")
+    for stage, stats in result["stages"].items():
+        line = f"{stage:>12} {stats['mean_ms']:8.2f} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}"
+        base = baseline["stages"].get(stage) if baseline else None
+        if base:
+            line += f" {stats['p50_ms'] - base['p50_ms']:+12.2f} {stats['p95_ms'] - base['p95_ms']:+12.2f}"
+        print(line)
+    if "detection" in result:
+        print(f"{'detection':>12} " + ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}" for key, value in result["detection"].items()))
+    if "allocated_kb_per_frame" in result:
+        allocated = result["allocated_kb_per_frame"]
+        print(f"{'allocated':>12} {allocated['mean']:8.1f} KB/frame mean, {allocated['p95']:.1f} p95, {allocated['max']:.1f} max")
+    if baseline:
+        print(f"{'throughput':>12} {result['fps'] - baseline['fps']:+.1f} FPS vs baseline ({baseline['fps']:.1f} FPS)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark of the game loop or flow analysis over a video file")
+    parser.add_argument("video")
+    parser.add_argument("--mode", choices=["game", "analysis"], default="game")
+    parser.add_argument("--backend", default=os.environ.get("PETRA_BACKEND", "torch"))
+    parser.add_argument("--detector", choices=DETECTORS, default=os.environ.get("PETRA_DETECTOR", "yolo"))
+    parser.add_argument("--weights", default=None)
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--allocations", action="store_true", help="trace per-frame memory allocations (game mode; slows the run)")
+    parser.add_argument("--every-frame", action="store_true", help="run the detector on every frame, without optical-flow propagation (game mode)")
+    parser.add_argument("--no-gate", action="store_true", help="turn off the motion gate (game mode)")
+    parser.add_argument("--roi", action="store_true", help="crop detection around the tracked balls, as PETRA_ROI=1 does (game mode)")
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.video, args.mode, args.backend, args.weights, args.imgsz, args.frames, args.seed, detector=args.detector, allocations=args.allocations,
+                       propagate=not args.every_frame, gate=not args.no_gate, roi=args.roi)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import cv2
+
+CACHE_PATH = os.environ.get("PETRA_CAMERA_CACHE", os.path.join(os.path.expanduser("~"), ".petra_camera.json"))
+PROBE_TIMEOUT = 3.0
+
+
+def load_cached():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f).get("index")
+    except (OSError, ValueError):
+        return None
+
+
+def remember(index):
+    try:
+        with open(CACHE_PATH, "w") as f:
+            json.dump({"index": index}, f)
+    except OSError:
+        pass
+
+
+def candidate_indices(preferred=None, max_index=10):
+    # The last working device first, then the caller's preference, then what
+    # actually exists under /dev (Linux) instead of blindly trying 0..max_index.
+    devices = sorted(int(match.group(1)) for match in (re.search(r"video(\d+)$", path) for path in glob.glob("/dev/video*")) if match)
+    if not devices and not sys.platform.startswith("linux"):
+        devices = list(range(max_index))
+    candidates = []
+    for index in [load_cached(), preferred] + devices:
+        if index is not None and index not in candidates:
+            candidates.append(index)
+    return candidates
+
+
+def probe(index):
+    cap = cv2.VideoCapture(index)
+    try:
+        return cap.isOpened() and cap.read()[0]
+    finally:
+        cap.release()
+
+
+def probe_with_timeout(index, timeout=PROBE_TIMEOUT):
+    # On a daemon thread, so a wedged driver costs at most `timeout`.
+    result = []
+
+    def run():
+        try:
+            result.append(probe(index))
+        except cv2.error:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return bool(result and result[0])
+
+
+def find_camera(preferred=None, timeout=PROBE_TIMEOUT):
+    # Opens the device that worked last time if it still does; otherwise probes
+    # every candidate at once on daemon threads (a wedged driver cannot hold up
+    # startup or exit) and returns the first working one in preference order,
+    # or -1. PETRA_CAMERA=<index> skips discovery.
+    if os.environ.get("PETRA_CAMERA"):
+        return int(os.environ["PETRA_CAMERA"])
+    if os.environ.get("PETRA_REPLAY"):
+        # A replayed session (see session.py) stands in for the camera.
+        return preferred or 0
+    start = time.time()
+    cached = load_cached()
+    if cached is not None and probe_with_timeout(cached, timeout):
+        print(f"Camera {cached} (cached) opened in {time.time() - start:.2f} s")
+        return cached
+    start = time.time()
+    candidates = [index for index in candidate_indices(preferred) if index != cached]
+    results = {}
+    done = {index: threading.Event() for index in candidates}
+
+    def run(index):
+        try:
+            results[index] = probe(index)
+        except cv2.error:
+            results[index] = False
+        finally:
+            done[index].set()
+
+    for index in candidates:
+        threading.Thread(target=run, args=(index,), daemon=True).start()
+    for index in candidates:
+        remaining = max(0.0, start + timeout - time.time())
+        if done[index].wait(remaining) and results[index]:
+            print(f"Camera {index} found in {time.time() - start:.2f} s")
+            remember(index)
+            return index
+    return -1
+
+
+def capture_size(imgsz=None, aspect=(4, 3)):
+    # Frames wider than the detector input are only shrunk again by the letterbox.
+    width = imgsz or 640
+    return width, width * aspect[1] // aspect[0]
+
+
+def decode_fourcc(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+def camera_settings(cap):
+    return {
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS),
+        "fourcc": decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def open_camera(index, size=None, fps=30, fourcc="MJPG", buffer_size=1):
+    # Asks the driver for a one-frame buffer (no stale frames queued behind the
+    # one being processed) and compressed MJPG, which most USB webcams deliver
+    # at full frame rate where raw YUYV cannot. Drivers may ignore any of these,
+    # so the negotiated settings are read back and printed.
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        return cap
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if size:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    settings = camera_settings(cap)
+    print(f"Camera {index}: {settings['width']}x{settings['height']} @ {settings['fps']:.0f} fps, {settings['fourcc'] or '?'}, buffer {settings['buffer_size']}")
+    return cap
+
+
+if __name__ == "__main__":
+    start = time.time()
+    index = find_camera(timeout=float(sys.argv[1]) if len(sys.argv) > 1 else PROBE_TIMEOUT)
+    print(f"Discovery took {time.time() - start:.2f} s")
+    if index == -1:
+        print("No camera found.")
+        sys.exit(1)
+    open_camera(index, capture_size()).release()
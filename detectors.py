@@ -0,0 +1,148 @@
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from backends import compare, load_backend, match_rate
+
+# Detectors share the backend interface: predict(image) returns an (N, 6)
+# float32 array of [x1, y1, x2, y2, conf, cls] and `names` maps cls to label.
+
+# OpenCV hue runs 0-179. Ranges cover the coloured balls the games act on.
+COLOR_RANGES = {
+    "green": ((35, 80, 60), (85, 255, 255)),
+    "blue": ((95, 80, 60), (130, 255, 255)),
+    "orange": ((5, 120, 100), (22, 255, 255)),
+}
+DEFAULT_NAMES = {0: "blue", 1: "green", 2: "orange"}
+
+
+class ColorDetector:
+    # HSV threshold and contour detector for the target balls, about a
+    # millisecond per frame. It works on a downscaled copy and sets `ambiguous`
+    # when the frame needs a second opinion: a blob that is not round enough
+    # (balls touching or partly hidden) or a change in the number of balls.
+    name = "color"
+
+    def __init__(self, names=None, input_format="rgb", scale=0.5, min_area=60, min_fill=0.5, ranges=COLOR_RANGES):
+        self.names = dict(names or DEFAULT_NAMES)
+        self.input_format = input_format
+        self.scale = scale
+        self.min_area = min_area
+        self.min_fill = min_fill
+        ids = {label: cls for cls, label in self.names.items()}
+        self.ranges = [(ids[label], np.array(low), np.array(high)) for label, (low, high) in ranges.items() if label in ids]
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.ambiguous = False
+        self._last_count = None
+
+    def predict(self, image):
+        small = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA) if self.scale != 1 else image
+        hsv = cv2.cvtColor(small, cv2.COLOR_RGB2HSV if self.input_format == "rgb" else cv2.COLOR_BGR2HSV)
+        detections = []
+        ambiguous = False
+        for cls, low, high in self.ranges:
+            mask = cv2.morphologyEx(cv2.inRange(hsv, low, high), cv2.MORPH_OPEN, self.kernel)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area < self.min_area * self.scale ** 2:
+                    continue
+                _, radius = cv2.minEnclosingCircle(contour)
+                fill = area / (np.pi * radius ** 2) if radius > 0 else 0.0
+                if fill < self.min_fill:
+                    ambiguous = True
+                x, y, w, h = cv2.boundingRect(contour)
+                detections.append((x, y, x + w, y + h, min(fill, 1.0), cls))
+        if not detections:
+            detections = np.zeros((0, 6), dtype=np.float32)
+        else:
+            detections = np.array(detections, dtype=np.float32)
+            detections[:, :4] /= self.scale
+        if self._last_count is not None and len(detections) != self._last_count:
+            ambiguous = True
+        self._last_count = len(detections)
+        self.ambiguous = ambiguous
+        return detections
+
+
+class CascadeDetector:
+    # The colour detector runs on every frame. YOLO runs every `confirm_every`
+    # frames, or at once when the colour result is ambiguous, and its answer is
+    # used for that frame. While the two disagree, YOLO runs on every frame.
+    name = "cascade"
+
+    def __init__(self, color, model, confirm_every=15, min_agreement=0.8):
+        self.color = color
+        self.model = model
+        self.names = model.names
+        self.imgsz = getattr(model, "imgsz", None)
+        self.confirm_every = confirm_every
+        self.min_agreement = min_agreement
+        self.frames = 0
+        self.confirmations = 0
+        self.disagreements = 0
+        self._since_confirm = confirm_every
+        self._disagreeing = False
+
+    def predict(self, image):
+        self.frames += 1
+        detections = self.color.predict(image)
+        self._since_confirm += 1
+        if not (self._disagreeing or self.color.ambiguous or self._since_confirm >= self.confirm_every):
+            return detections
+        confirmed = self.model.predict(image)
+        self.confirmations += 1
+        self._since_confirm = 0
+        agreement = (match_rate(confirmed, detections) + match_rate(detections, confirmed)) / 2
+        self._disagreeing = agreement < self.min_agreement
+        if self._disagreeing:
+            self.disagreements += 1
+        return confirmed
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "confirmations": self.confirmations,
+            "disagreements": self.disagreements,
+            "yolo_ratio": self.confirmations / self.frames if self.frames else 0.0,
+        }
+
+
+DETECTORS = ["yolo", "color", "cascade"]
+
+
+def load_detector(kind=None, backend=None, path=None, imgsz=None, input_format="rgb"):
+    # PETRA_DETECTOR picks yolo (default), color or cascade; the YOLO part uses
+    # PETRA_BACKEND like the rest of the games.
+    kind = kind or os.environ.get("PETRA_DETECTOR", "yolo")
+    if kind == "color":
+        return ColorDetector(input_format=input_format)
+    model = load_backend(backend or os.environ.get("PETRA_BACKEND", "torch"), path, imgsz)
+    if kind == "cascade":
+        return CascadeDetector(ColorDetector(model.names, input_format), model)
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the colour and cascade detectors against YOLO")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("videos", nargs="+")
+    compare_parser.add_argument("--backend", default=os.environ.get("PETRA_BACKEND", "torch"))
+    compare_parser.add_argument("--imgsz", type=int, default=None)
+    compare_parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    for video in args.videos:
+        # Fresh detectors per clip so colour history and cascade state do not carry over.
+        model = load_backend(args.backend, imgsz=args.imgsz)
+        cascade = CascadeDetector(ColorDetector(model.names), model)
+        compare(video, [model, ColorDetector(model.names), cascade], args.frames)
+        print(f"  cascade: {cascade.stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import argparse
+import time
+
+import numpy as np
+
+COIL = 0
+BOMB = 1
+SPEED_BOOST = 2
+MAGNET = 3
+X2 = 4
+SHOT = 5
+
+POWER_UPS = {SPEED_BOOST: "speed_boost", MAGNET: "magnet", X2: "x2"}
+POWER_UP_KINDS = {name: kind for kind, name in POWER_UPS.items()}
+
+
+class EntityStore:
+    # Positions, sizes, kinds and spawn times of every live entity in parallel NumPy
+    # arrays; the first `count` rows are alive. Movement and collision run on all
+    # rows at once and dead rows are compacted with swap-remove.
+    def __init__(self, capacity=64):
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.count
+        position = np.zeros((capacity, 2), dtype=np.float32)
+        previous = np.zeros((capacity, 2), dtype=np.float32)
+        size = np.zeros((capacity, 2), dtype=np.float32)
+        kind = np.zeros(capacity, dtype=np.int8)
+        spawn_time = np.zeros(capacity, dtype=np.float64)
+        if old:
+            position[:old] = self.position[:old]
+            previous[:old] = self.previous[:old]
+            size[:old] = self.size[:old]
+            kind[:old] = self.kind[:old]
+            spawn_time[:old] = self.spawn_time[:old]
+        self.position, self.previous, self.size, self.kind, self.spawn_time = position, previous, size, kind, spawn_time
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, kind, x, y, width, height, spawn_time=0.0):
+        if self.count == len(self.kind):
+            self._allocate(len(self.kind) * 2)
+        index = self.count
+        self.position[index] = (x, y)
+        self.previous[index] = (x, y)
+        self.size[index] = (width, height)
+        self.kind[index] = kind
+        self.spawn_time[index] = spawn_time
+        self.count += 1
+        return index
+
+    def spawn_many(self, kind, positions, width, height, spawn_time=0.0):
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        needed = self.count + len(positions)
+        if needed > len(self.kind):
+            self._allocate(max(needed, len(self.kind) * 2))
+        rows = slice(self.count, needed)
+        self.position[rows] = positions
+        self.previous[rows] = positions
+        self.size[rows] = (width, height)
+        self.kind[rows] = kind
+        self.spawn_time[rows] = spawn_time
+        self.count = needed
+
+    def save_previous(self):
+        # Snapshot positions before a simulation step, for interpolated rendering.
+        self.previous[:self.count] = self.position[:self.count]
+
+    def move(self, dx, dy=0.0):
+        self.position[:self.count] += (dx, dy)
+
+    def collide(self, rect):
+        # Mask of live entities overlapping a pygame.Rect (same edges as colliderect).
+        x, y = self.position[:self.count, 0], self.position[:self.count, 1]
+        width, height = self.size[:self.count, 0], self.size[:self.count, 1]
+        return (x < rect.right) & (x + width > rect.left) & (y < rect.bottom) & (y + height > rect.top)
+
+    def outside(self, left=None, right=None):
+        x = self.position[:self.count, 0]
+        mask = np.zeros(self.count, dtype=bool)
+        if left is not None:
+            mask |= x + self.size[:self.count, 0] < left
+        if right is not None:
+            mask |= x > right
+        return mask
+
+    def of_kind(self, *kinds):
+        return np.isin(self.kind[:self.count], kinds)
+
+    def count_kind(self, *kinds):
+        return int(self.of_kind(*kinds).sum())
+
+    def remove(self, mask):
+        # Bulk swap-remove: holes below the new count are filled from survivors above it.
+        mask = np.asarray(mask, dtype=bool)
+        dead = np.flatnonzero(mask)
+        if not len(dead):
+            return 0
+        new_count = self.count - len(dead)
+        holes = dead[dead < new_count]
+        movers = np.flatnonzero(~mask[new_count:]) + new_count
+        for array in (self.position, self.previous, self.size, self.kind, self.spawn_time):
+            array[holes] = array[movers]
+        self.count = new_count
+        return len(dead)
+
+    def clear(self, *kinds):
+        if kinds:
+            self.remove(self.of_kind(*kinds))
+        else:
+            self.count = 0
+
+    def items(self, alpha=None):
+        # (kind, (x, y)) for blitting, optionally interpolated between the last two steps.
+        position = self.position[:self.count]
+        if alpha is not None:
+            position = self.previous[:self.count] + (position - self.previous[:self.count]) * alpha
+        return zip(self.kind[:self.count].tolist(), position.astype(int).tolist())
+
+
+def stress(counts, frames=300, screen_size=(800, 600)):
+    # Frame cost of move + collide + compact with thousands of entities, no window needed.
+    import pygame
+
+    width, height = screen_size
+    player_rect = pygame.Rect(width // 4, height // 2, 128, 128)
+    rng = np.random.default_rng(0)
+    for count in counts:
+        store = EntityStore()
+        store.spawn_many(COIL, rng.uniform((0, 0), (width, height), (count, 2)), 64, 64)
+        timings = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            store.move(-3)
+            hit = store.collide(player_rect)
+            removed = store.remove(hit | store.outside(left=0))
+            store.spawn_many(COIL, np.column_stack((rng.uniform(width, width + 200, removed), rng.uniform(0, height, removed))), 64, 64)
+            timings.append(time.perf_counter() - start)
+        timings = np.array(timings) * 1000
+        print(f"{count:>7} entities: mean {timings.mean():.3f} ms  p95 {np.percentile(timings, 95):.3f} ms per frame")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entity store stress test")
+    parser.add_argument("--stress", type=int, nargs="+", default=[10, 100, 1000, 5000, 20000])
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+    stress(args.stress, args.frames)
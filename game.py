@@ -1,12 +1,13 @@
 import pygame
-import cv2
-import torch
+import os
 import numpy as np
-from ultralytics import YOLO
-import requests
-from io import BytesIO
 import sys
 import time
+from assets import asset_cache, GAME_ASSETS
+from hud import CameraPreview, text_renderer
+from roi import roi_from_env
+from startup import draw_loading, make_loader
+from tracker import Tracker
 
 pygame.init()
 
@@ -15,77 +16,79 @@ screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Underwater Object Detection Game")
 clock = pygame.time.Clock()
 FPS = 30
+MENU_FPS = 15
+DETECT_INTERVAL = 3
+loader = make_loader(GAME_ASSETS, "game")
+loader.start()
 
-def load_image(url, size=None):
-    response = requests.get(url)
-    image = pygame.image.load(BytesIO(response.content)).convert_alpha()
-    if size:
-        image = pygame.transform.scale(image, size)
-    return image
-
-player_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/f2.png?alt=media&token=a01aa678-4437-4408-8479-e69ddb05c7f3"
-coil_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/image.png?alt=media&token=e7cd5083-7d87-466b-9296-8d171014f6be"
-background_url = "https://firebasestorage.googleapis.com/v0/b/gcxsys.appspot.com/o/DALLE_2024-10-02_11.02.21_-_A_cartoon-style_background_image_resembling_an_underwater_scene_with_light_aqua-green_tones._The_top_section_has_simplified_exaggerated_wave_patterns.webp?alt=media&token=f290632a-10ad-461e-9622-7ed49ccc7999"
-
-try:
-    player_img = load_image(player_url, size=(64, 64))
-    coil_img = load_image(coil_url, size=(32, 32))
-    background_img = load_image(background_url, size=(SCREEN_WIDTH, SCREEN_HEIGHT))
-except:
-    pygame.quit()
-    sys.exit()
-
-player_rect = player_img.get_rect(center=(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2))
 player_speed = 3
 
-def auto_detect_camera():
-    for index in range(10):
-        cap = cv2.VideoCapture(index)
-        if cap.read()[0]:
-            cap.release()
-            return index
-    return -1
+def load_images():
+    # Decoded from the asset cache on the main thread once the loader is done.
+    global player_img, coil_img, background_img, player_rect
+    images = asset_cache.load_all(GAME_ASSETS, "game")
+    player_img = images["player"]
+    coil_img = images["coil"]
+    background_img = images["background"]
+    player_rect = player_img.get_rect(center=(SCREEN_WIDTH // 4, SCREEN_HEIGHT // 2))
 
 def draw_text(text, size, color, x, y):
-    font = pygame.font.Font(None, size)
-    text_surface = font.render(text, True, color)
-    screen.blit(text_surface, (x, y))
+    screen.blit(text_renderer.render(text, size, color), (x, y))
 
 def start_menu():
     start_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, SCREEN_HEIGHT // 2 - 50, 200, 100)
+    progress_bar = pygame.Rect(SCREEN_WIDTH // 2 - 150, SCREEN_HEIGHT // 2 + 80, 300, 20)
     running = True
+    dirty = True
+    shown = None
     while running:
-        screen.fill((0, 105, 148))
-        draw_text("Underwater Object Game", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
-        pygame.draw.rect(screen, (255, 255, 255), start_button)
-        draw_text("Start", 36, (0, 0, 0), start_button.x + 50, start_button.y + 25)
-        pygame.display.flip()
+        # Redrawn when the window needs it or the loader has moved on.
+        if dirty or loader.state != shown:
+            shown = loader.state
+            screen.fill((0, 105, 148))
+            draw_text("Underwater Object Game", 50, (255, 255, 255), SCREEN_WIDTH // 2 - 200, SCREEN_HEIGHT // 2 - 150)
+            draw_loading(screen, loader, start_button, progress_bar)
+            dirty = False
+        clock.tick(MENU_FPS)
 
         for event in pygame.event.get():
+            if event.type == pygame.VIDEOEXPOSE:
+                dirty = True
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if start_button.collidepoint(event.pos):
+                if start_button.collidepoint(event.pos) and loader.ready:
+                    load_images()
                     return
 
 def game_loop(camera_index):
+    from models import model_manager
+    from motion_gate import MotionGate
+    from pipeline import DetectionPipeline
+    from propagate import DetectionScheduler
+    from session import open_session
+
     try:
-        model = YOLO("best.pt")
+        model = model_manager.get()
     except:
         pygame.quit()
         sys.exit()
 
-    cap = cv2.VideoCapture(camera_index)
+    cap, model, recorder, replay = open_session(camera_index, model, (SCREEN_WIDTH, SCREEN_HEIGHT))
     if not cap.isOpened():
         pygame.quit()
         sys.exit()
 
-    previous_positions = {}
+    pipeline = DetectionPipeline(cap, model, (SCREEN_WIDTH, SCREEN_HEIGHT), DetectionScheduler(DETECT_INTERVAL, adaptive=True), roi_from_env(), MotionGate(), recorder, replay=replay)
+    pipeline.start()
+
+    tracker = Tracker()
+    preview = CameraPreview(visible=bool(os.environ.get("PETRA_PREVIEW")))
     target_labels = ["green", "blue", "orange"]
     score = 0
-    base_image_taken = False
-    base_image = None
+    debug_label = ""
+    direction = ""
 
     coil_rect = coil_img.get_rect(topleft=(SCREEN_WIDTH, np.random.randint(SCREEN_HEIGHT // 4, SCREEN_HEIGHT - 32)))
 
@@ -99,61 +102,49 @@ def game_loop(camera_index):
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F2:
+                preview.toggle()
 
-        ret, frame = cap.read()
-        if not ret:
+        if pipeline.finished:
             break
 
-        frame = cv2.resize(frame, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        if not base_image_taken:
-            base_image = frame_rgb.copy()
-            base_image_taken = True
-
-        results = model(frame_rgb)
-        detections = results[0].boxes.data.tolist()
-        current_positions = {}
-        debug_label = ""
-        direction = ""
-        object_detected = False
-
-        for det in detections:
-            x1, y1, x2, y2, conf, cls = det
-            label = model.names[int(cls)]
-            if label in target_labels:
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                current_positions[int(cls)] = (center_x, center_y)
-                object_detected = True
-                if int(cls) in previous_positions:
-                    prev_x, prev_y = previous_positions[int(cls)]
-                    delta_y = center_y - prev_y
-
-                    if delta_y < -5:
-                        if label == "green":
-                            player_rect.y += player_speed
-                        elif label == "orange":
-                            player_rect.y += player_speed * 2
-                        elif label == "blue":
-                            player_rect.y += player_speed * 3
-                        direction = "down"
-                    elif delta_y > 5:
-                        if label == "green":
-                            player_rect.y -= player_speed
-                        elif label == "orange":
-                            player_rect.y -= player_speed * 2
-                        elif label == "blue":
-                            player_rect.y -= player_speed * 3
-                        direction = "up"
-                    debug_label = label
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36, 255, 12), 2)
-
-        if not object_detected:
-            player_rect.y -= player_speed // 2
-
-        previous_positions = current_positions.copy()
+        result = pipeline.poll()
+        if result is not None:
+            boxes = []
+            debug_label = ""
+            direction = ""
+            object_detected = False
+
+            for track in tracker.update(result.detections, result.frame_timestamp):
+                label = model.names[track.cls]
+                if label in target_labels:
+                    object_detected = True
+                    if track.hits > 1:
+                        delta_y = track.delta[1]
+
+                        if delta_y < -5:
+                            if label == "green":
+                                player_rect.y += player_speed
+                            elif label == "orange":
+                                player_rect.y += player_speed * 2
+                            elif label == "blue":
+                                player_rect.y += player_speed * 3
+                            direction = "down"
+                        elif delta_y > 5:
+                            if label == "green":
+                                player_rect.y -= player_speed
+                            elif label == "orange":
+                                player_rect.y -= player_speed * 2
+                            elif label == "blue":
+                                player_rect.y -= player_speed * 3
+                            direction = "up"
+                        debug_label = label
+                    boxes.append((*track.box, f"{label} #{track.id}"))
+
+            if not object_detected:
+                player_rect.y -= player_speed // 2
+            preview.update(result.frame, boxes)
+
         player_rect.y = max(SCREEN_HEIGHT // 4, min(player_rect.y, SCREEN_HEIGHT - player_rect.height))
 
         if player_rect.colliderect(coil_rect):
@@ -178,15 +169,18 @@ def game_loop(camera_index):
         draw_text(f"Score: {score}", 36, (255, 255, 255), 10, 10)
         debug_text = f"Label: {debug_label} | Direction: {direction}"
         draw_text(debug_text, 36, (255, 255, 255), 10, 50)
+        preview.draw(screen.blit, (SCREEN_WIDTH - preview.size[0] - 10, SCREEN_HEIGHT - preview.size[1] - 10))
 
         pygame.display.flip()
 
+    pipeline.stop()
     cap.release()
+    print(f"Pipeline: {pipeline.stats()}")
     pygame.quit()
 
 def main():
     start_menu()
-    camera_index = auto_detect_camera()
+    camera_index = loader.results["camera"]
     if camera_index == -1:
         print("No camera found.")
         pygame.quit()
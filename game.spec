@@ -1,4 +1,8 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+
+sys.path.insert(0, SPECPATH)
+from startup import LIBRARIES
 
 
 a = Analysis(
@@ -6,7 +10,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Loaded by name in the background (startup.LIBRARIES), which the analysis cannot see.
+    hiddenimports=LIBRARIES,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
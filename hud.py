@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+
+import pygame
+
+
+class TextRenderer:
+    # One pygame Font per size and an LRU of rendered surfaces keyed by
+    # (text, size, colour), so unchanged HUD labels are blitted, not re-rendered.
+    def __init__(self, max_surfaces=256):
+        self.max_surfaces = max_surfaces
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font(size).render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_surfaces:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "fonts": len(self._fonts),
+            "surfaces": len(self._surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+text_renderer = TextRenderer()
+
+
+class StatsOverlay:
+    # Rolling FPS, per-stage mean ms and counters from a StageTimer. The lines are
+    # rebuilt every `refresh` seconds so the text cache is not flooded with
+    # numbers that change every frame.
+    def __init__(self, timer, stages, size=24, color=(255, 255, 0), refresh=0.5):
+        self.timer = timer
+        self.stages = stages
+        self.size = size
+        self.color = color
+        self.refresh = refresh
+        self.visible = False
+        # Timing as launched (PETRA_PROFILE / PETRA_METRICS); hiding the overlay goes back to it.
+        self.profiling = timer.enabled
+        self._lines = []
+        self._updated = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        # Timing may have been off until now; the overlay needs it while shown.
+        self.timer.enabled = self.visible or self.profiling
+        self._updated = 0.0
+
+    def lines(self):
+        now = time.time()
+        if now - self._updated >= self.refresh:
+            self._updated = now
+            summary = self.timer.summary()
+            self._lines = [f"FPS {self.timer.fps:5.1f}"]
+            for stage in self.stages:
+                if stage in summary:
+                    self._lines.append(f"{stage:<11} {summary[stage]['mean_ms']:6.2f} ms")
+            for name, value in self.timer.counters.items():
+                self._lines.append(f"{name} {value}")
+        return self._lines
+
+    def draw(self, blit, position):
+        # `blit` is screen.blit or DirtyRenderer.blit.
+        if not self.visible:
+            return
+        x, y = position
+        for line in self.lines():
+            surface = text_renderer.render(line, self.size, self.color)
+            blit(surface, (x, y))
+            y += surface.get_height()
+
+
+class CameraPreview:
+    # Picture-in-picture camera view with the tracked boxes. The frame's RGB
+    # buffer is wrapped as a surface without copying and scaled straight into a
+    # preview surface with the same pixel format (scale copies bytes as they are,
+    # so a default surface would swap red and blue); the wrapper is not kept, so
+    # the pipeline can reuse the buffer as soon as update() returns.
+    def __init__(self, size=(200, 150), visible=False, color=(0, 255, 0), label_size=16):
+        self.size = size
+        self.visible = visible
+        self.color = color
+        self.label_size = label_size
+        self.surface = None
+        self._labels = []
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def update(self, frame, boxes=()):
+        # `boxes` holds (x1, y1, x2, y2, label) in frame pixels.
+        if not self.visible:
+            return
+        height, width = frame.rgb.shape[:2]
+        source = pygame.image.frombuffer(frame.rgb, (width, height), "RGB")
+        if self.surface is None:
+            self.surface = pygame.Surface(self.size, 0, source)
+        pygame.transform.scale(source, self.size, self.surface)
+        sx = self.size[0] / width
+        sy = self.size[1] / height
+        self._labels = []
+        for x1, y1, x2, y2, label in boxes:
+            rect = pygame.Rect(int(x1 * sx), int(y1 * sy), int((x2 - x1) * sx), int((y2 - y1) * sy))
+            pygame.draw.rect(self.surface, self.color, rect, 1)
+            self._labels.append((label, rect.topleft))
+
+    def draw(self, blit, position):
+        if not self.visible or self.surface is None:
+            return
+        x, y = position
+        blit(self.surface, position)
+        for label, (lx, ly) in self._labels:
+            blit(text_renderer.render(label, self.label_size, self.color), (x + lx, y + max(0, ly - 12)))
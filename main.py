@@ -1,27 +1,27 @@
+import sys
 import cv2
-import torch
 import numpy as np
-import matplotlib.pyplot as plt
-from ultralytics import YOLO
-
-model = YOLO("best.pt")
-cap = cv2.VideoCapture(0)
-
-speed_values = []
-peak_flow_values = []
-previous_positions = []
+from camera import find_camera, open_camera
+from detectors import load_detector
+from peak_flow import PeakFlowStats, SpeedClassifier, centroids, grid_speeds
+from sparkline import Sparkline, SparklineThread
+from timing import metrics_from_env
+
+# PETRA_DETECTOR selects YOLO (default), the colour detector or the cascade.
+model = load_detector(input_format="bgr")
+camera_index = find_camera(preferred=0)
+if camera_index == -1:
+    print("No camera found.")
+    sys.exit(1)
+cap = open_camera(camera_index, (640, 480))
+
+flow_stats = PeakFlowStats()
+previous_positions = np.zeros((0, 2), dtype=np.int32)
 cc_per_sec = 0
 
-def update_peak_flow_graph():
-    plt.clf()
-    plt.plot(peak_flow_values, label='Peak Flow', color='blue')
-    plt.title("Peak Flow Over Time")
-    plt.xlabel("Frames")
-    plt.ylabel("Peak Flow")
-    plt.legend()
-    plt.pause(0.001)
-
-plt.ion()
+# The peak flow graph is drawn into the video frame; rendering runs on its own thread.
+peak_flow_graph = SparklineThread(Sparkline((240, 80)))
+peak_flow_graph.start()
 
 grid_size = 15
 frame_height, frame_width = 480, 640
@@ -33,66 +33,83 @@ performance_thresholds = {
     "Medium": (1, 2),
     "High": (2, 3)
 }
+speed_classifier = SpeedClassifier(performance_thresholds)
 
 last_patient_class = "N/A"
 frame_count = 0
 update_interval = 10
 
+# PETRA_PROFILE=1 / PETRA_METRICS=<file> enable timing; press 't' to show it on the video.
+timer, exporter = metrics_from_env()
+profiling = timer.enabled
+show_timing = False
+timing_lines = []
+
 try:
     while True:
         frame_count += 1
-        ret, frame = cap.read()
+        with timer.span("capture"):
+            ret, frame = cap.read()
         if not ret:
             break
 
-        for i in range(1, grid_size):
-            cv2.line(frame, (0, i * square_height), (frame_width, i * square_height), (255, 255, 255), 1)
-            cv2.line(frame, (i * square_width, 0), (i * square_width, frame_height), (255, 255, 255), 1)
-
-        with torch.no_grad():
-            results = model(frame)
-
-        detections = results[0].boxes.xyxy.cpu().numpy()
-        current_positions = []
-        ball_count = len(detections)
-        cc_per_sec = ball_count * 600
-
-        classified_patient_class = "N/A"
-
-        for detection in detections:
-            x1, y1, x2, y2 = detection[:4]
-            current_positions.append((int((x1 + x2) / 2), int((y1 + y2) / 2)))
-            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-
-        if previous_positions:
-            for current_pos in current_positions:
-                for prev_pos in previous_positions:
-                    if current_pos != prev_pos:
-                        x_move = (current_pos[0] // square_width) - (prev_pos[0] // square_width)
-                        y_move = (current_pos[1] // square_height) - (prev_pos[1] // square_height)
-                        speed = np.sqrt(x_move ** 2 + y_move ** 2)
-                        speed_values.append(speed)
-                        peak_flow = np.mean(speed_values)
-                        peak_flow_values.append(peak_flow)
-                        for patient_class, (lower, upper) in performance_thresholds.items():
-                            if lower <= speed < upper:
-                                classified_patient_class = patient_class
-                                break
-
-        last_patient_class = classified_patient_class if classified_patient_class != "N/A" else last_patient_class
-        cv2.putText(frame, f"Patient Class: {last_patient_class}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-        cv2.putText(frame, f"CC/sec: {cc_per_sec}", (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-        previous_positions = current_positions
-        cv2.imshow("Object Detection", frame)
+        with timer.span("grid"):
+            for i in range(1, grid_size):
+                cv2.line(frame, (0, i * square_height), (frame_width, i * square_height), (255, 255, 255), 1)
+                cv2.line(frame, (i * square_width, 0), (i * square_width, frame_height), (255, 255, 255), 1)
+
+        with timer.span("inference"):
+            detections = model.predict(frame)
+
+        with timer.span("postprocess"):
+            ball_count = len(detections)
+            cc_per_sec = ball_count * 600
+
+            current_positions = centroids(detections[:, :4])
+            speeds = grid_speeds(current_positions, previous_positions, square_width, square_height)
+            flow_stats.add_speeds(speeds)
+            classified_patient_class = speed_classifier.last_label(speeds)
+
+        with timer.span("render"):
+            for x1, y1, x2, y2 in detections[:, :4].astype(int):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+            last_patient_class = classified_patient_class if classified_patient_class != "N/A" else last_patient_class
+            cv2.putText(frame, f"Patient Class: {last_patient_class}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            cv2.putText(frame, f"CC/sec: {cc_per_sec}", (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            cv2.putText(frame, f"Peak Flow: {flow_stats.peak_flow:.2f} ({flow_stats.windowed_peak_flow:.2f} recent)", (50, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            previous_positions = current_positions
+
+            peak_flow_graph.draw(frame, (10, frame_height - 90))
+            if show_timing:
+                if frame_count % 15 == 0 or not timing_lines:
+                    summary = timer.summary()
+                    timing_lines = [f"FPS {timer.fps:.1f}"] + [f"{stage} {stats['mean_ms']:.1f} ms" for stage, stats in summary.items()]
+                for i, line in enumerate(timing_lines):
+                    cv2.putText(frame, line, (frame_width - 220, 20 + i * 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            cv2.imshow("Object Detection", frame)
 
         if frame_count % update_interval == 0:
-            update_peak_flow_graph()
+            with timer.span("plot"):
+                peak_flow_graph.submit(flow_stats.series())
+
+        if timer.enabled:
+            timer.frame()
+            if exporter is not None:
+                exporter.maybe_export()
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
             break
+        if key == ord('t'):
+            show_timing = not show_timing
+            # Hiding the overlay stops timing again unless PETRA_PROFILE/PETRA_METRICS asked for it.
+            timer.enabled = show_timing or profiling
+            timing_lines = []
 
 finally:
+    if exporter is not None:
+        exporter.export()
     cap.release()
     cv2.destroyAllWindows()
-    plt.ioff()
-    plt.show()
+    peak_flow_graph.stop()
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from detectors import load_detector
+
+
+class ModelManager:
+    # Loads the detector once on a background thread, runs one warm-up inference
+    # and hands the same instance to every game session.
+    def __init__(self, backend=None, path=None, imgsz=None, warmup_size=(800, 600), detector=None):
+        self.backend = backend or os.environ.get("PETRA_BACKEND", "torch")
+        self.detector = detector or os.environ.get("PETRA_DETECTOR", "yolo")
+        self.path = path
+        self.imgsz = imgsz or int(os.environ.get("PETRA_IMGSZ", 0)) or None
+        self.warmup_size = warmup_size
+        self.model = None
+        self.error = None
+        self.load_time = None
+        self.warmup_time = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        try:
+            start = time.time()
+            model = load_detector(self.detector, self.backend, self.path, self.imgsz)
+            self.load_time = time.time() - start
+
+            width, height = self.warmup_size
+            start = time.time()
+            model.predict(np.zeros((height, width, 3), dtype=np.uint8))
+            self.warmup_time = time.time() - start
+            self.model = model
+            print(f"Model ({self.detector}, {self.backend}) loaded in {self.load_time:.2f} s, warm-up {self.warmup_time:.2f} s")
+        except Exception as e:
+            self.error = e
+            print(f"Error loading {self.backend} model: {e}")
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def get(self, timeout=None):
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"Model ({self.backend}) is still loading")
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+
+model_manager = ModelManager()
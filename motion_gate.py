@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Cheap check on a small grayscale copy of the frame. When almost nothing changed
+    # since the last detected frame, `matched` is "previous" and the caller reuses its
+    # last detections; when the frame is back to the base image (the first frame),
+    # `matched` is "base" and the caller reuses the detections it had for that frame.
+    def __init__(self, size=(80, 60), pixel_threshold=12, changed_fraction=0.005, use_base=True, max_skip=30):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.use_base = use_base
+        self.max_skip = max_skip
+        self.base = None
+        self.previous = None
+        self.matched = None
+        self.checked = 0
+        self.skipped = 0
+        self._consecutive = 0
+        self._gray = None
+
+    def _small(self, bgr):
+        if self._gray is None or self._gray.shape != bgr.shape[:2]:
+            self._gray = np.empty(bgr.shape[:2], dtype=np.uint8)
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return cv2.GaussianBlur(cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA), (3, 3), 0)
+
+    def _changed(self, a, b):
+        return np.count_nonzero(cv2.absdiff(a, b) > self.pixel_threshold) / a.size
+
+    def should_detect(self, bgr):
+        small = self._small(bgr)
+        self.checked += 1
+        self.matched = None
+        if self.previous is None:
+            self.previous = small
+            if self.use_base:
+                self.base = small
+            return True
+
+        if self._consecutive < self.max_skip:
+            if self._changed(small, self.previous) < self.changed_fraction:
+                self.matched = "previous"
+            elif self.base is not None and self._changed(small, self.base) < self.changed_fraction:
+                self.matched = "base"
+                self.previous = self.base
+            if self.matched is not None:
+                self._consecutive += 1
+                self.skipped += 1
+                return False
+
+        self.previous = small
+        self._consecutive = 0
+        return True
+
+    def reset_base(self):
+        self.base = self.previous
+
+    def stats(self):
+        return {
+            "gate_checked": self.checked,
+            "gate_skipped": self.skipped,
+            "gate_skip_ratio": self.skipped / self.checked if self.checked else 0.0,
+        }
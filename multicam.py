@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from pipeline import CaptureThread, DetectionPipeline, DetectionResult, Frame, LatestSlot
+
+# Several rehab stations on one machine: each camera has its own capture thread
+# and result slot, and a single worker stacks the newest frame of every stream
+# into one predict_batch call on one shared model.
+
+
+class Station:
+    # The per-camera view of a MultiCameraPipeline, with the same poll/latest/
+    # finished/stats interface as DetectionPipeline, so a game session can use either.
+    def __init__(self, index, cap, size):
+        self.index = index
+        self.cap = cap
+        self.frames = LatestSlot(Frame.release)
+        self.results = LatestSlot(DetectionResult.release)
+        self._polled = None
+        self.capture = CaptureThread(cap, size, self.frames)
+        self.inferred = 0
+
+    @property
+    def finished(self):
+        return self.frames.closed and self.frames.depth() == 0 and self.results.depth() == 0
+
+    def latest(self):
+        return self.results.peek()
+
+    def poll(self):
+        # As DetectionPipeline.poll: the previous result's frame goes back to the pool.
+        result = self.results.get(timeout=0)
+        if result is not None:
+            if self._polled is not None:
+                self._polled.release()
+            self._polled = result
+        return result
+
+    def stats(self):
+        return {
+            "captured": self.capture.captured,
+            "inferred": self.inferred,
+            "dropped_frames": self.frames.dropped,
+            "dropped_results": self.results.dropped,
+        }
+
+
+class BatchedInferenceWorker(threading.Thread):
+    def __init__(self, model, stations, wait=0.005):
+        super().__init__(daemon=True)
+        self.model = model
+        self.stations = stations
+        self.wait = wait
+        self.batches = 0
+        self.batch_sizes = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = []
+            for station in self.stations:
+                frame = station.frames.get(timeout=0)
+                if frame is not None:
+                    batch.append((station, frame))
+            if not batch:
+                if all(station.frames.closed for station in self.stations):
+                    break
+                # Nothing new from any camera yet; wait a little for the next frames.
+                time.sleep(self.wait)
+                continue
+            start = time.time()
+            outputs = self.model.predict_batch([frame.rgb for _, frame in batch])
+            now = time.time()
+            for (station, frame), detections in zip(batch, outputs):
+                station.results.put(DetectionResult(frame, now, detections, now - start))
+                station.inferred += 1
+            self.batches += 1
+            self.batch_sizes += len(batch)
+        for station in self.stations:
+            station.results.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class MultiCameraPipeline:
+    def __init__(self, caps, model, size):
+        self.stations = [Station(index, cap, size) for index, cap in enumerate(caps)]
+        self.worker = BatchedInferenceWorker(model, self.stations)
+
+    def start(self):
+        for station in self.stations:
+            station.capture.start()
+        self.worker.start()
+
+    def stop(self):
+        for station in self.stations:
+            station.capture.stop()
+        self.worker.stop()
+        for station in self.stations:
+            station.capture.join(timeout=1.0)
+        self.worker.join(timeout=1.0)
+
+    @property
+    def finished(self):
+        return not self.worker.is_alive()
+
+    def stats(self):
+        return {
+            "inferred": sum(station.inferred for station in self.stations),
+            "streams": [station.stats() for station in self.stations],
+            "batches": self.worker.batches,
+            "avg_batch_size": self.worker.batch_sizes / self.worker.batches if self.worker.batches else 0.0,
+        }
+
+
+def open_source(source):
+    return cv2.VideoCapture(int(source) if source.isdigit() else source)
+
+
+def blank_frame(size=(800, 600)):
+    return np.zeros((size[1], size[0], 3), dtype=np.uint8)
+
+
+def run_streams(sources, model, size=(800, 600), seconds=20.0, batched=True):
+    # Runs until every stream ends or `seconds` pass; returns frames inferred per second.
+    # With batched=False each stream gets its own DetectionPipeline; backends are not
+    # thread-safe, so that mode is only given one stream per model (see `single`).
+    caps = [open_source(source) for source in sources]
+    if batched:
+        pipelines = [MultiCameraPipeline(caps, model, size)]
+    else:
+        pipelines = [DetectionPipeline(cap, model, size) for cap in caps]
+    start = time.time()
+    for pipeline in pipelines:
+        pipeline.start()
+    while time.time() - start < seconds and not all(pipeline.finished for pipeline in pipelines):
+        time.sleep(0.01)
+    elapsed = time.time() - start
+    for pipeline in pipelines:
+        pipeline.stop()
+    for cap in caps:
+        cap.release()
+    stats = [pipeline.stats() for pipeline in pipelines]
+    inferred = sum(stat["inferred"] for stat in stats)
+    return {"streams": len(sources), "seconds": elapsed, "inferred": inferred, "fps": inferred / elapsed, "stats": stats}
+
+
+def benchmark(sources, streams, backend, imgsz, seconds):
+    # Batched: one process, one model, N streams. Independent: N processes, each
+    # with its own model and a single-stream DetectionPipeline, as deployed today.
+    from backends import load_backend
+
+    sources = [sources[i % len(sources)] for i in range(streams)]
+    model = load_backend(backend, imgsz=imgsz)
+    model.predict_batch([blank_frame()] * streams)
+    batched = run_streams(sources, model, seconds=seconds)
+
+    command = [sys.executable, os.path.abspath(__file__), "single", "--backend", backend, "--seconds", str(seconds)]
+    if imgsz:
+        command += ["--imgsz", str(imgsz)]
+    processes = [subprocess.Popen(command + [source], stdout=subprocess.PIPE, text=True) for source in sources]
+    independent = [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in processes]
+    independent_fps = sum(result["fps"] for result in independent)
+
+    print(f"{streams} streams, {backend} @ {model.imgsz}")
+    print(f"  batched (1 process):       {batched['fps']:7.1f} frames/s total, {batched['fps'] / streams:6.1f} per stream, avg batch {batched['stats'][0]['avg_batch_size']:.2f}")
+    print(f"  independent ({streams} processes): {independent_fps:7.1f} frames/s total, {independent_fps / streams:6.1f} per stream")
+    return {"batched": batched, "independent": independent}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batched multi-camera inference benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("bench", help="batched vs independent processes")
+    bench_parser.add_argument("sources", nargs="+", help="camera indices or video files, reused round-robin")
+    bench_parser.add_argument("--streams", type=int, default=None)
+    single_parser = commands.add_parser("single", help="one stream in this process (used by bench)")
+    single_parser.add_argument("source")
+    for sub in (bench_parser, single_parser):
+        sub.add_argument("--backend", default=os.environ.get("PETRA_BACKEND", "torch"))
+        sub.add_argument("--imgsz", type=int, default=None)
+        sub.add_argument("--seconds", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "single":
+        from backends import load_backend
+
+        model = load_backend(args.backend, imgsz=args.imgsz)
+        model.predict(blank_frame())
+        result = run_streams([args.source], model, seconds=args.seconds, batched=False)
+        print(json.dumps({"fps": result["fps"], "inferred": result["inferred"]}))
+    else:
+        benchmark(args.sources, args.streams or len(args.sources), args.backend, args.imgsz, args.seconds)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
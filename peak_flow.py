@@ -0,0 +1,232 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class RunningStats:
+    # Welford's online count/mean/variance, O(1) per sample.
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def add_batch(self, values):
+        # Chan et al. pairwise merge of a whole batch into the running moments.
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class EwmaMean:
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.value = None
+
+    def add(self, value):
+        if self.value is None:
+            self.value = float(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+
+    def add_batch(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        if self.value is None:
+            self.value = float(values[0])
+            values = values[1:]
+        n = len(values)
+        weights = self.alpha * (1 - self.alpha) ** np.arange(n - 1, -1, -1)
+        self.value = (1 - self.alpha) ** n * self.value + float(weights @ values)
+
+
+class WindowedMean:
+    # Mean of the last `size` samples with a running sum instead of re-summing the window.
+    def __init__(self, size=300):
+        self.values = deque(maxlen=size)
+        self._sum = 0.0
+
+    def add(self, value):
+        if len(self.values) == self.values.maxlen:
+            self._sum -= self.values[0]
+        self.values.append(value)
+        self._sum += value
+
+    @property
+    def value(self):
+        return self._sum / len(self.values) if self.values else 0.0
+
+
+class RingBuffer:
+    # Fixed-capacity float series; old samples are overwritten once full.
+    def __init__(self, capacity=2000):
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._start = 0
+        self.size = 0
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def append(self, value):
+        end = (self._start + self.size) % self.capacity
+        self._data[end] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return self.size
+
+    def to_array(self):
+        end = self._start + self.size
+        if end <= self.capacity:
+            return self._data[self._start:end].copy()
+        return np.concatenate((self._data[self._start:], self._data[:end - self.capacity]))
+
+
+class PeakFlowStats:
+    # Replaces the unbounded speed_values/peak_flow_values lists in main.py.
+    def __init__(self, window=300, ewma_alpha=0.05, history=2000):
+        self.speed = RunningStats()
+        self.ewma = EwmaMean(ewma_alpha) if ewma_alpha else None
+        self.window = WindowedMean(window) if window else None
+        self.history = RingBuffer(history)
+
+    def add_speed(self, speed):
+        self.speed.add(speed)
+        if self.ewma is not None:
+            self.ewma.add(speed)
+        if self.window is not None:
+            self.window.add(speed)
+        self.history.append(self.speed.mean)
+
+    def add_speeds(self, speeds):
+        # One batch per frame: the plotted series gets a single point per frame.
+        if len(speeds) == 0:
+            return
+        self.speed.add_batch(speeds)
+        if self.ewma is not None:
+            self.ewma.add_batch(speeds)
+        if self.window is not None:
+            for speed in speeds:
+                self.window.add(float(speed))
+        self.history.append(self.speed.mean)
+
+    @property
+    def peak_flow(self):
+        return self.speed.mean
+
+    @property
+    def windowed_peak_flow(self):
+        return self.window.value if self.window is not None else self.speed.mean
+
+    @property
+    def ewma_peak_flow(self):
+        return self.ewma.value if self.ewma is not None and self.ewma.value is not None else self.speed.mean
+
+    def series(self):
+        return self.history.to_array()
+
+
+def centroids(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2), axis=1).astype(np.int32)
+
+
+def grid_cells(points, square_width, square_height):
+    return points // np.array([square_width, square_height], dtype=points.dtype)
+
+
+def nearest_previous(current, previous):
+    # Index of the nearest previous centroid for every current centroid, from one
+    # (n_current, n_previous) squared-distance matrix.
+    diff = current[:, None, :].astype(np.float32) - previous[None, :, :].astype(np.float32)
+    return np.argmin((diff ** 2).sum(axis=2), axis=1)
+
+
+def grid_speeds(current, previous, square_width, square_height):
+    if len(current) == 0 or len(previous) == 0:
+        return np.zeros(0, dtype=np.float32)
+    matched = previous[nearest_previous(current, previous)]
+    # As in the original per-pair loop, a centroid that did not move at all is
+    # skipped rather than counted as speed 0 (which would classify as "Low").
+    moved = np.any(current != matched, axis=1)
+    moves = grid_cells(current[moved], square_width, square_height) - grid_cells(matched[moved], square_width, square_height)
+    return np.hypot(moves[:, 0], moves[:, 1]).astype(np.float32)
+
+
+class SpeedClassifier:
+    def __init__(self, thresholds):
+        ordered = sorted(thresholds.items(), key=lambda item: item[1][0])
+        self.labels = np.array([label for label, _ in ordered])
+        self.edges = np.array([lower for _, (lower, _) in ordered] + [ordered[-1][1][1]], dtype=np.float32)
+
+    def classify(self, speeds):
+        # Bin index per speed; -1 for speeds outside every threshold range.
+        bins = np.digitize(speeds, self.edges) - 1
+        bins[(bins < 0) | (bins >= len(self.labels))] = -1
+        return bins
+
+    def last_label(self, speeds, default="N/A"):
+        bins = self.classify(speeds)
+        bins = bins[bins >= 0]
+        return str(self.labels[bins[-1]]) if len(bins) else default
+
+
+PERFORMANCE_THRESHOLDS = {"Low": (0, 1), "Medium": (1, 2), "High": (2, 3)}
+
+
+class FlowAnalyzer:
+    # main.py's per-frame analysis without the drawing, for offline runs.
+    def __init__(self, frame_size=(640, 480), grid_size=15, thresholds=PERFORMANCE_THRESHOLDS, cc_per_ball=600):
+        self.square_width = frame_size[0] // grid_size
+        self.square_height = frame_size[1] // grid_size
+        self.cc_per_ball = cc_per_ball
+        self.flow_stats = PeakFlowStats()
+        self.classifier = SpeedClassifier(thresholds)
+        self.previous_positions = np.zeros((0, 2), dtype=np.int32)
+        self.patient_class = "N/A"
+
+    def update(self, detections):
+        current_positions = centroids(detections[:, :4])
+        speeds = grid_speeds(current_positions, self.previous_positions, self.square_width, self.square_height)
+        self.flow_stats.add_speeds(speeds)
+        label = self.classifier.last_label(speeds)
+        self.patient_class = label if label != "N/A" else self.patient_class
+        self.previous_positions = current_positions
+        return {
+            "balls": len(detections),
+            "grid_speed": float(speeds.mean()) if len(speeds) else 0.0,
+            "patient_class": self.patient_class,
+            "cc_per_sec": len(detections) * self.cc_per_ball,
+            "peak_flow": float(self.flow_stats.peak_flow),
+        }
@@ -0,0 +1,331 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from propagate import BoxPropagator
+from timing import StageTimer
+
+
+class LatestSlot:
+    # Single-item mailbox: a new item replaces an unread one instead of queueing
+    # behind it. `on_drop` is called with each item replaced before it was read.
+    def __init__(self, on_drop=None):
+        self.on_drop = on_drop
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self._read_seq = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        with self._cond:
+            dropped = self._item if self._seq > self._read_seq else None
+            if dropped is not None:
+                self.dropped += 1
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        # Blocks until an item newer than the last one read is available.
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._read_seq or self.closed, timeout):
+                return None
+            if self._seq <= self._read_seq:
+                return None
+            self._read_seq = self._seq
+            return self._item
+
+    def peek(self):
+        with self._cond:
+            return self._item
+
+    def depth(self):
+        with self._cond:
+            return 1 if self._seq > self._read_seq else 0
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FramePool:
+    # Preallocated BGR/RGB buffer pairs that capture writes into with dst=, so no
+    # frame-sized arrays are allocated per frame. A pair is in use from acquire()
+    # until its Frame is released; the pool only grows if every pair is in use.
+    def __init__(self, size, count=6):
+        self.size = size
+        self.count = 0
+        self._free = []
+        self._lock = threading.Lock()
+        for _ in range(count):
+            self._free.append(self._allocate())
+
+    def _allocate(self):
+        width, height = self.size
+        self.count += 1
+        return np.empty((height, width, 3), dtype=np.uint8), np.empty((height, width, 3), dtype=np.uint8)
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            return self._allocate()
+
+    def release(self, bgr, rgb):
+        with self._lock:
+            self._free.append((bgr, rgb))
+
+    def __len__(self):
+        return self.count
+
+
+class Frame:
+    # Owned by one stage at a time: capture, the frame slot, the worker, the
+    # result slot, then whoever polled the result. Whoever drops it calls
+    # release(), after which bgr/rgb are None rather than silently reused pixels.
+    def __init__(self, index, timestamp, bgr, rgb, pool=None):
+        self.index = index
+        self.timestamp = timestamp
+        self.bgr = bgr
+        self.rgb = rgb
+        self.pool = pool
+
+    def release(self):
+        if self.pool is not None and self.bgr is not None:
+            self.pool.release(self.bgr, self.rgb)
+        self.bgr = self.rgb = None
+
+
+class DetectionResult:
+    def __init__(self, frame, timestamp, detections, inference_time, detected=True):
+        self.frame = frame
+        self.frame_index = frame.index
+        self.frame_timestamp = frame.timestamp
+        self.timestamp = timestamp
+        self.detections = detections
+        self.inference_time = inference_time
+        self.detected = detected
+
+    def release(self):
+        self.frame.release()
+
+
+class CaptureThread(threading.Thread):
+    def __init__(self, cap, size, frames, recorder=None, timer=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.size = size
+        self.frames = frames
+        self.recorder = recorder
+        self.timer = timer or StageTimer(enabled=False)
+        self.pool = FramePool(size)
+        self.captured = 0
+        self.failed = False
+        self._stop_event = threading.Event()
+
+    def grab(self, raw=None):
+        # Returns (frame, raw) or (None, raw) at the end of the stream. `raw` is
+        # the decoder's buffer; passing it back lets the next read fill it in place.
+        with self.timer.span("capture"):
+            ret, raw = self.cap.read(raw)
+        if not ret:
+            return None, raw
+        frame, frame_rgb = self.pool.acquire()
+        with self.timer.span("resize"):
+            cv2.resize(raw, self.size, dst=frame)
+        with self.timer.span("convert"):
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        self.captured += 1
+        return Frame(self.captured - 1, time.time(), frame, frame_rgb, self.pool), raw
+
+    def run(self):
+        raw = None
+        while not self._stop_event.is_set():
+            captured, raw = self.grab(raw)
+            if captured is None:
+                self.failed = True
+                break
+            if self.recorder is not None:
+                self.recorder.add_frame(captured)
+            self.frames.put(captured)
+        self.frames.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class InferenceWorker(threading.Thread):
+    def __init__(self, model, frames, results, scheduler=None, roi=None, gate=None, recorder=None, timer=None, replay=None):
+        super().__init__(daemon=True)
+        self.model = model
+        self.replay = replay
+        self.frames = frames
+        self.results = results
+        self.recorder = recorder
+        self.timer = timer or StageTimer(enabled=False)
+        self.scheduler = scheduler
+        self.roi = roi
+        self.gate = gate
+        self._last_detections = None
+        self._base_detections = None
+        self.propagator = BoxPropagator() if scheduler is not None else None
+        # Two grayscale buffers in turn: the propagator keeps the previous one.
+        self._gray = [None, None]
+        self._gray_index = 0
+        self.inferred = 0
+        self._stop_event = threading.Event()
+
+    def _detect(self, frame):
+        if self.roi is None:
+            with self.timer.span("inference"):
+                return self.model.predict(frame.rgb)
+        x1, y1, x2, y2 = self.roi.select(frame.rgb.shape, frame.index)
+        with self.timer.span("inference"):
+            detections = self.model.predict(frame.rgb[y1:y2, x1:x2])
+        detections[:, :4] += (x1, y1, x1, y1)
+        return detections
+
+    def _process(self, frame):
+        # Returns (detections, detected). Between scheduled detections the previous
+        # boxes are carried forward with optical flow; a static scene with nothing
+        # tracked reuses the last detections.
+        if self.replay is not None:
+            # Replaying a recorded session: serve what the live run produced for this frame.
+            return self.replay.lookup(frame.index)
+        # The gate compares against the last frame it let through, so slow movement
+        # reads as static for several frames and reused boxes would then jump. It
+        # is only asked while nothing is tracked; tracked boxes follow the movement
+        # through propagation instead.
+        tracking = self.propagator is not None and self.propagator.tracking
+        if self.gate is not None and not tracking and not self.gate.should_detect(frame.bgr):
+            reuse = self._base_detections if self.gate.matched == "base" else self._last_detections
+            if reuse is not None:
+                return reuse, False
+        if self.propagator is None:
+            return self._detect(frame), True
+        gray = self._gray[self._gray_index]
+        if gray is None or gray.shape != frame.bgr.shape[:2]:
+            gray = self._gray[self._gray_index] = np.empty(frame.bgr.shape[:2], dtype=np.uint8)
+        cv2.cvtColor(frame.bgr, cv2.COLOR_BGR2GRAY, dst=gray)
+        self._gray_index ^= 1
+        # With nothing tracked, flow cannot see a ball entering the view, so the
+        # detector runs on every frame until something is found.
+        if tracking and not self.scheduler.due():
+            with self.timer.span("propagate"):
+                detections, confidence = self.propagator.propagate(gray)
+            if not self.scheduler.propagated(confidence):
+                if self.roi is not None:
+                    self.roi.update(detections, frame.rgb.shape)
+                return detections, False
+        detections = self._detect(frame)
+        self.propagator.reset(gray, detections)
+        self.scheduler.detected()
+        return detections, True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            frame = self.frames.get(timeout=0.1)
+            if frame is None:
+                if self.frames.closed:
+                    break
+                continue
+            self.results.put(self.handle(frame))
+        self.results.close()
+
+    def handle(self, frame):
+        # One frame through detection or propagation; benchmark.py calls this
+        # directly to run the same path synchronously.
+        start = time.time()
+        detections, detected = self._process(frame)
+        self._last_detections = detections
+        if self._base_detections is None and detected:
+            self._base_detections = detections
+        if detected and self.roi is not None:
+            self.roi.update(detections, frame.rgb.shape)
+        now = time.time()
+        result = DetectionResult(frame, now, detections, now - start, detected)
+        if self.recorder is not None:
+            self.recorder.add_result(result)
+        if detected:
+            self.inferred += 1
+        return result
+
+    def stats(self):
+        stats = {"inferred": self.inferred}
+        if self.scheduler is not None:
+            stats.update(self.scheduler.stats())
+        if self.roi is not None:
+            stats.update(self.roi.stats())
+        if self.gate is not None:
+            stats.update(self.gate.stats())
+        if self.replay is not None:
+            stats.update(cache_hits=self.replay.hits, cache_misses=self.replay.misses)
+        return stats
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class DetectionPipeline:
+    # Capture and inference run on their own threads; the render loop only ever
+    # reads the newest published result and never waits on the camera or model.
+    def __init__(self, cap, model, size, scheduler=None, roi=None, gate=None, recorder=None, timer=None, replay=None):
+        self.cap = cap
+        self.recorder = recorder
+        # Frames and results replaced before anyone read them go back to the pool.
+        self.frames = LatestSlot(Frame.release)
+        self.results = LatestSlot(DetectionResult.release)
+        self._polled = None
+        self.capture = CaptureThread(cap, size, self.frames, recorder, timer)
+        self.worker = InferenceWorker(model, self.frames, self.results, scheduler, roi, gate, recorder, timer, replay)
+
+    def start(self):
+        self.capture.start()
+        self.worker.start()
+
+    def stop(self):
+        self.capture.stop()
+        self.worker.stop()
+        self.capture.join(timeout=1.0)
+        self.worker.join(timeout=1.0)
+        if self.recorder is not None:
+            self.recorder.close()
+
+    @property
+    def finished(self):
+        return not self.worker.is_alive() and self.results.depth() == 0
+
+    def latest(self):
+        return self.results.peek()
+
+    def poll(self):
+        # Newest result not yet handed out, or None; never blocks. A result's
+        # frame stays valid until the next result is handed out, so copy it to
+        # keep the pixels longer.
+        result = self.results.get(timeout=0)
+        if result is not None:
+            if self._polled is not None:
+                self._polled.release()
+            self._polled = result
+        return result
+
+    def stats(self):
+        worker = self.worker.stats()
+        stats = {
+            "captured": self.capture.captured,
+            "frame_buffers": len(self.capture.pool),
+            "inferred": worker.pop("inferred"),
+            "dropped_frames": self.frames.dropped,
+            "dropped_results": self.results.dropped,
+            "frame_queue_depth": self.frames.depth(),
+            "result_queue_depth": self.results.depth(),
+        }
+        stats.update(worker)
+        return stats
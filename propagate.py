@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+
+class BoxPropagator:
+    # Moves the last detected boxes along with Lucas-Kanade optical flow of a few
+    # keypoints inside each box, so YOLO does not have to run on every frame.
+    def __init__(self, max_points=12, min_points=3, fb_threshold=1.5, win_size=(15, 15), max_level=2):
+        self.max_points = max_points
+        self.min_points = min_points
+        self.fb_threshold = fb_threshold
+        self.lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+        )
+        self.prev_gray = None
+        self.detections = np.zeros((0, 6), dtype=np.float32)
+
+    @property
+    def ready(self):
+        return self.prev_gray is not None
+
+    @property
+    def tracking(self):
+        return self.ready and len(self.detections) > 0
+
+    def reset(self, gray, detections):
+        self.prev_gray = gray
+        self.detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+
+    def _box_points(self, gray, box):
+        height, width = gray.shape[:2]
+        x1, y1, x2, y2 = np.clip(box, 0, [width - 1, height - 1, width, height]).astype(int)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return np.zeros((0, 2), dtype=np.float32)
+        corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+        if corners is None or len(corners) < self.min_points:
+            # Flat-coloured balls often have no corners; fall back to a small grid.
+            xs = np.linspace(x1, x2, 5)[1:-1]
+            ys = np.linspace(y1, y2, 5)[1:-1]
+            return np.array([(x, y) for y in ys for x in xs], dtype=np.float32)
+        return corners.reshape(-1, 2) + np.array([x1, y1], dtype=np.float32)
+
+    def propagate(self, gray):
+        # Returns (detections, confidence); confidence is the worst per-box ratio of
+        # keypoints that survived the forward-backward consistency check. With no
+        # boxes there is nothing to vouch for, so confidence is 0.
+        if not len(self.detections):
+            self.prev_gray = gray
+            return self.detections.copy(), 0.0
+
+        points = []
+        owners = []
+        for index, det in enumerate(self.detections):
+            box_points = self._box_points(self.prev_gray, det[:4])
+            points.append(box_points)
+            owners.append(np.full(len(box_points), index))
+        points = np.concatenate(points).reshape(-1, 1, 2)
+        owners = np.concatenate(owners)
+
+        moved = self.detections.copy()
+        confidences = np.zeros(len(self.detections), dtype=np.float32)
+        if len(points):
+            forward, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None, **self.lk_params)
+            backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, forward, None, **self.lk_params)
+            fb_error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.fb_threshold)
+            shifts = (forward - points).reshape(-1, 2)
+            for index in range(len(self.detections)):
+                mine = owners == index
+                kept = good & mine
+                total = int(mine.sum())
+                if total == 0 or kept.sum() < self.min_points:
+                    continue
+                dx, dy = np.median(shifts[kept], axis=0)
+                moved[index, [0, 2]] += dx
+                moved[index, [1, 3]] += dy
+                confidences[index] = kept.sum() / total
+
+        self.prev_gray = gray
+        self.detections = moved
+        return moved.copy(), float(confidences.min())
+
+
+class DetectionScheduler:
+    # Decides on which frames the detector runs. With adaptive=True the interval
+    # grows while flow stays confident and shrinks when it has to be corrected.
+    def __init__(self, interval=3, adaptive=False, min_interval=1, max_interval=8, min_confidence=0.5):
+        self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_confidence = min_confidence
+        self.detections = 0
+        self.propagations = 0
+        self.forced = 0
+        self._since_detection = interval
+
+    def due(self):
+        return self._since_detection >= self.interval
+
+    def detected(self):
+        self.detections += 1
+        self._since_detection = 1
+
+    def propagated(self, confidence):
+        # Returns True when flow confidence is too low and detection must run now;
+        # such a frame counts as a detection only, not also as a propagation.
+        self._since_detection += 1
+        if confidence < self.min_confidence:
+            self.forced += 1
+            if self.adaptive:
+                self.interval = max(self.min_interval, self.interval - 1)
+            return True
+        self.propagations += 1
+        if self.adaptive and self._since_detection >= self.interval and confidence > 0.8:
+            self.interval = min(self.max_interval, self.interval + 1)
+        return False
+
+    def stats(self):
+        total = self.detections + self.propagations
+        return {
+            "detect_interval": self.interval,
+            "detections": self.detections,
+            "propagations": self.propagations,
+            "forced_detections": self.forced,
+            "detection_ratio": self.detections / total if total else 0.0,
+        }
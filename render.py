@@ -0,0 +1,100 @@
+import time
+
+import pygame
+
+
+class ScrollingBackground:
+    # The background pre-composited twice side by side into one display-format
+    # surface, so a scrolled frame is a single blit of a window into it.
+    def __init__(self, image):
+        self.width, self.height = image.get_size()
+        self.surface = pygame.Surface((self.width * 2, self.height)).convert()
+        self.surface.blit(image, (0, 0))
+        self.surface.blit(image, (self.width, 0))
+
+    def draw(self, target, offset):
+        return target.blit(self.surface, (0, 0), pygame.Rect(-offset % self.width, 0, self.width, self.height))
+
+    def restore(self, target, rect, offset):
+        return target.blit(self.surface, rect.topleft, rect.move(-offset % self.width, 0))
+
+
+class DirtyRenderer:
+    # Redraws the full screen only when the background moved or after invalidate();
+    # otherwise erases last frame's sprite rects and updates just the changed areas.
+    def __init__(self, screen, background=None, fill_color=(0, 0, 0)):
+        self.screen = screen
+        self.background = background
+        self.fill_color = fill_color
+        self.screen_area = screen.get_width() * screen.get_height()
+        self._previous = []
+        self._current = []
+        self._offset = None
+        self._full = True
+        self._start = 0.0
+        self.blit_area = 0
+        self.update_area = 0
+        self.render_time = 0.0
+        self.frames = 0
+        self.full_frames = 0
+        self.total_blit_area = 0
+        self.total_render_time = 0.0
+
+    def invalidate(self):
+        self._full = True
+
+    def _restore(self, rect):
+        if self.background is not None:
+            return self.background.restore(self.screen, rect, self._offset)
+        return self.screen.fill(self.fill_color, rect)
+
+    def begin(self, offset=0):
+        self._start = time.perf_counter()
+        self.blit_area = 0
+        if offset != self._offset:
+            self._full = True
+        self._offset = offset
+        if self._full:
+            if self.background is not None:
+                self.background.draw(self.screen, offset)
+            else:
+                self.screen.fill(self.fill_color)
+            self.blit_area += self.screen_area
+        else:
+            for rect in self._previous:
+                rect = self._restore(rect)
+                self.blit_area += rect.width * rect.height
+        self._current = []
+
+    def blit(self, surface, position):
+        rect = self.screen.blit(surface, position)
+        self.blit_area += rect.width * rect.height
+        self._current.append(rect)
+        return rect
+
+    def present(self):
+        if self._full:
+            pygame.display.flip()
+            self.update_area = self.screen_area
+            self.full_frames += 1
+        else:
+            rects = self._previous + self._current
+            pygame.display.update(rects)
+            self.update_area = sum(rect.width * rect.height for rect in rects)
+        self._previous = self._current
+        self._full = False
+        self.render_time = time.perf_counter() - self._start
+        self.frames += 1
+        self.total_blit_area += self.blit_area
+        self.total_render_time += self.render_time
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            "blit_area": self.blit_area,
+            "update_area": self.update_area,
+            "render_ms": self.render_time * 1000,
+            "avg_blit_area": self.total_blit_area / frames,
+            "avg_render_ms": self.total_render_time * 1000 / frames,
+            "full_frame_ratio": self.full_frames / frames,
+        }
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+
+class RoiSelector:
+    # Crops detection to a margin around the last known objects, falling back to a
+    # full-frame search when nothing is known or once `full_frame_every` frames have
+    # passed since the last one. Counted in frames, not detections: with the
+    # adaptive interval, detections can be 8 frames apart, and a ball entering
+    # outside the crop must still be found within a third of a second.
+    def __init__(self, margin=0.75, min_size=160, full_frame_every=10):
+        self.margin = margin
+        self.min_size = min_size
+        self.full_frame_every = full_frame_every
+        self.last_boxes = np.zeros((0, 4), dtype=np.float32)
+        self.full_frame_searches = 0
+        self.roi_searches = 0
+        self._last_full = None
+
+    def select(self, shape, index):
+        # Returns (x1, y1, x2, y2) of the region to run the detector on for frame `index`.
+        height, width = shape[:2]
+        due = self._last_full is None or index - self._last_full >= self.full_frame_every
+        region = None if due else self._region(width, height)
+        if region is None:
+            self._last_full = index
+            self.full_frame_searches += 1
+            return 0, 0, width, height
+        self.roi_searches += 1
+        return region
+
+    def _region(self, width, height):
+        # The last boxes plus a margin, or None when there is nothing to crop to.
+        if not len(self.last_boxes):
+            return None
+        x1, y1 = self.last_boxes[:, :2].min(axis=0)
+        x2, y2 = self.last_boxes[:, 2:].max(axis=0)
+        pad_x = max((x2 - x1) * self.margin, (self.min_size - (x2 - x1)) / 2, 0)
+        pad_y = max((y2 - y1) * self.margin, (self.min_size - (y2 - y1)) / 2, 0)
+        x1 = int(max(0, x1 - pad_x))
+        y1 = int(max(0, y1 - pad_y))
+        x2 = int(min(width, x2 + pad_x))
+        y2 = int(min(height, y2 + pad_y))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def update(self, detections, shape):
+        # Propagated boxes are not clipped and can drift past the frame edge;
+        # only what is still inside the frame is kept.
+        height, width = shape[:2]
+        boxes = np.clip(np.asarray(detections, dtype=np.float32).reshape(-1, 6)[:, :4], 0, [width, height, width, height])
+        self.last_boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+
+    def stats(self):
+        total = self.full_frame_searches + self.roi_searches
+        return {
+            "roi_searches": self.roi_searches,
+            "full_frame_searches": self.full_frame_searches,
+            "roi_ratio": self.roi_searches / total if total else 0.0,
+        }
+
+
+def roi_from_env():
+    # Off unless PETRA_ROI=1: the crop saves inference time on large frames, but
+    # can be slower to notice a ball that enters away from the tracked ones.
+    return RoiSelector() if os.environ.get("PETRA_ROI") == "1" else None
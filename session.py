@@ -0,0 +1,199 @@
+import json
+import os
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera import capture_size, open_camera
+
+# A recorded session is a directory holding:
+#   session.json    seed, frame size/count, encoding, class names
+#   frames.avi      MJPG-encoded camera frames (encoding="mjpg"), or
+#   frames.raw      raw BGR frames, memory-mapped on replay (encoding="raw")
+#   detections.npz  the pipeline's result for each frame it published
+# Frames are stored after the pipeline's resize, so replay feeds the exact
+# images detection ran on (bit-exact with "raw").
+
+
+def seed_all(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+class SessionRecorder:
+    def __init__(self, path, seed, size, names=None, fps=30, encoding="mjpg"):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.seed = seed
+        self.size = size
+        self.names = dict(names or {})
+        self.fps = fps
+        self.encoding = encoding
+        self.timestamps = []
+        self.results = {}
+        self._lock = threading.Lock()
+        if encoding == "mjpg":
+            self._writer = cv2.VideoWriter(os.path.join(path, "frames.avi"), cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+        elif encoding == "raw":
+            self._writer = open(os.path.join(path, "frames.raw"), "wb")
+        else:
+            raise ValueError(f"Unknown frame encoding: {encoding}")
+
+    def add_frame(self, frame):
+        # Called from the capture thread for every frame, so position == frame.index.
+        if self.encoding == "mjpg":
+            self._writer.write(frame.bgr)
+        else:
+            self._writer.write(np.ascontiguousarray(frame.bgr).data)
+        self.timestamps.append(frame.timestamp)
+
+    def add_result(self, result):
+        with self._lock:
+            self.results[result.frame_index] = (np.asarray(result.detections, dtype=np.float32).reshape(-1, 6), result.detected)
+
+    def close(self):
+        if self.encoding == "mjpg":
+            self._writer.release()
+        else:
+            self._writer.close()
+        with self._lock:
+            indices = sorted(self.results)
+            boxes = [self.results[index][0] for index in indices]
+            detected = [self.results[index][1] for index in indices]
+        np.savez_compressed(
+            os.path.join(self.path, "detections.npz"),
+            indices=np.array(indices, dtype=np.int64),
+            detected=np.array(detected, dtype=bool),
+            offsets=np.cumsum([0] + [len(b) for b in boxes]).astype(np.int64),
+            boxes=np.concatenate(boxes) if boxes else np.zeros((0, 6), dtype=np.float32),
+            timestamps=np.array(self.timestamps, dtype=np.float64),
+        )
+        with open(os.path.join(self.path, "session.json"), "w") as f:
+            json.dump({
+                "seed": self.seed,
+                "size": list(self.size),
+                "fps": self.fps,
+                "encoding": self.encoding,
+                "frames": len(self.timestamps),
+                "names": {str(k): v for k, v in self.names.items()},
+            }, f, indent=2)
+        print(f"Recorded {len(self.timestamps)} frames, {len(indices)} results to {self.path}")
+
+
+class SessionPlayer:
+    # Stands in for cv2.VideoCapture. With realtime=True frames are released at
+    # their recorded pace, so the pipeline drops the same kind of frames it did live.
+    def __init__(self, path, realtime=True):
+        with open(os.path.join(path, "session.json")) as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.seed = self.meta["seed"]
+        self.realtime = realtime
+        self.timestamps = np.load(os.path.join(path, "detections.npz"))["timestamps"]
+        self.position = 0
+        self._start = None
+        width, height = self.meta["size"]
+        if self.meta["encoding"] == "raw":
+            self._frames = np.memmap(os.path.join(path, "frames.raw"), dtype=np.uint8, mode="r", shape=(self.meta["frames"], height, width, 3))
+            self._cap = None
+        else:
+            self._frames = None
+            self._cap = cv2.VideoCapture(os.path.join(path, "frames.avi"))
+
+    def isOpened(self):
+        return self._cap is None or self._cap.isOpened()
+
+    def read(self, image=None):
+        if self.position >= self.meta["frames"]:
+            return False, None
+        if self._cap is not None:
+            ret, frame = self._cap.read(image)
+            if not ret:
+                return False, None
+        else:
+            frame = np.array(self._frames[self.position])
+        if self.realtime:
+            if self._start is None:
+                self._start = time.time() - (self.timestamps[self.position] - self.timestamps[0])
+            delay = self._start + (self.timestamps[self.position] - self.timestamps[0]) - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        self.position += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.meta["size"][0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.meta["size"][1])
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.meta["fps"])
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.meta["frames"])
+        return 0.0
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+
+
+class CachedDetector:
+    # Serves the detections a recorded session produced, keyed by frame index,
+    # instead of running the model. Frames the live pipeline dropped get the
+    # most recent result before them, which is what the game saw at that time.
+    def __init__(self, path):
+        with open(os.path.join(path, "session.json")) as f:
+            meta = json.load(f)
+        self.names = {int(k): v for k, v in meta["names"].items()}
+        data = np.load(os.path.join(path, "detections.npz"))
+        self.indices = data["indices"]
+        self.detected = data["detected"]
+        self.offsets = data["offsets"]
+        self.boxes = data["boxes"]
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, index):
+        # Returns (detections, detected) like InferenceWorker._process.
+        position = int(np.searchsorted(self.indices, index, side="right")) - 1
+        if position < 0:
+            self.misses += 1
+            return np.zeros((0, 6), dtype=np.float32), False
+        if self.indices[position] == index:
+            self.hits += 1
+        else:
+            self.misses += 1
+        boxes = self.boxes[self.offsets[position]:self.offsets[position + 1]].copy()
+        return boxes, bool(self.detected[position]) and self.indices[position] == index
+
+    def predict(self, image):
+        raise RuntimeError("CachedDetector only serves recorded frames; replay with PETRA_REPLAY_MODEL=1 to run the model")
+
+
+def open_session(camera_index, model, size):
+    # PETRA_REPLAY=<dir> replays a recorded session instead of the camera, serving
+    # its cached detections unless PETRA_REPLAY_MODEL=1. PETRA_RECORD=<dir> records
+    # each live session to a timestamped directory under it (PETRA_RECORD_RAW=1 for
+    # uncompressed frames).
+    # Returns (cap, model, recorder, replay), where replay is the CachedDetector
+    # to pass to DetectionPipeline or None, and seeds random/np.random either way.
+    replay = os.environ.get("PETRA_REPLAY")
+    if replay:
+        player = SessionPlayer(replay)
+        seed_all(player.seed)
+        cache = CachedDetector(replay) if os.environ.get("PETRA_REPLAY_MODEL") != "1" else None
+        return player, model, None, cache
+
+    seed = int(time.time() * 1000) % 2 ** 32
+    seed_all(seed)
+    cap = open_camera(camera_index, capture_size(getattr(model, "imgsz", None)))
+    record = os.environ.get("PETRA_RECORD")
+    recorder = None
+    if record:
+        encoding = "raw" if os.environ.get("PETRA_RECORD_RAW") == "1" else "mjpg"
+        path = os.path.join(record, time.strftime("%Y%m%d-%H%M%S"))
+        recorder = SessionRecorder(path, seed, size, getattr(model, "names", None), encoding=encoding)
+    return cap, model, recorder, None
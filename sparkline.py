@@ -0,0 +1,75 @@
+import threading
+
+import cv2
+import numpy as np
+
+from pipeline import LatestSlot
+
+
+def decimate(values, width):
+    # Min/max envelope per output column: drawing cost depends on the plot
+    # width, not on the session length, and short peaks are never dropped.
+    values = np.asarray(values, dtype=np.float32)
+    if len(values) <= width:
+        return values, values
+    starts = np.linspace(0, len(values), width + 1).astype(int)[:-1]
+    return np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)
+
+
+class Sparkline:
+    # Draws a series into a small BGR image with NumPy and OpenCV only, for
+    # compositing straight into the video frame instead of a matplotlib window.
+    def __init__(self, size=(240, 80), color=(255, 128, 0), background=(32, 32, 32), label="Peak Flow"):
+        self.width, self.height = size
+        self.color = np.array(color, dtype=np.uint8)
+        self.background = background
+        self.label = label
+        self._rows = np.arange(self.height)[:, None]
+
+    def render(self, values):
+        image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        image[:] = self.background
+        low, high = decimate(values, self.width)
+        if len(high):
+            top_value = max(float(high.max()), 1e-6)
+            plot_height = self.height - 16
+            # Column x covers pixel rows from the envelope's high to its low value.
+            top = self.height - 1 - (high / top_value * plot_height).astype(int)
+            bottom = self.height - 1 - (low / top_value * plot_height).astype(int)
+            columns = self.width - len(high) + np.arange(len(high))
+            rows, index = np.nonzero((self._rows >= top[None, :]) & (self._rows <= bottom[None, :]))
+            image[rows, columns[index]] = self.color
+            cv2.putText(image, f"{self.label} max {top_value:.2f}", (4, 12), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        return image
+
+
+class SparklineThread(threading.Thread):
+    # Renders submitted series on its own thread; the capture loop only copies
+    # the newest finished image into its frame.
+    def __init__(self, sparkline):
+        super().__init__(daemon=True)
+        self.sparkline = sparkline
+        self.series = LatestSlot()
+        self.image = None
+
+    def submit(self, values):
+        self.series.put(values)
+
+    def run(self):
+        while True:
+            values = self.series.get()
+            if values is None:
+                break
+            self.image = self.sparkline.render(values)
+
+    def stop(self):
+        self.series.close()
+
+    def draw(self, frame, position, alpha=0.8):
+        image = self.image
+        if image is None:
+            return
+        x, y = position
+        region = frame[y:y + image.shape[0], x:x + image.shape[1]]
+        image = image[:region.shape[0], :region.shape[1]]
+        region[:] = cv2.addWeighted(image, alpha, region, 1 - alpha, 0)
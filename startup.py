@@ -0,0 +1,190 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pygame
+
+from hud import text_renderer
+
+# Times are counted from this module's import, or from the launch time that
+# measure() passes in PETRA_STARTUP_T0.
+LAUNCHED = float(os.environ.get("PETRA_STARTUP_T0") or time.time())
+marks = {}
+# Imported by the loader behind the start menu instead of at the top of the
+# games; game.spec bundles them as hidden imports from this list.
+LIBRARIES = ["cv2", "camera", "models", "motion_gate", "pipeline", "propagate", "session"]
+
+
+def mark(name):
+    # Seconds since launch at which `name` happened, kept once.
+    if name not in marks:
+        marks[name] = time.time() - LAUNCHED
+    return marks[name]
+
+
+def import_modules(*names):
+    return [importlib.import_module(name) for name in names]
+
+
+def load_libraries():
+    import_modules(*LIBRARIES)
+    # The model loads on its own thread while the remaining steps run.
+    from models import model_manager
+
+    model_manager.start()
+
+
+def load_model():
+    from models import model_manager
+
+    return model_manager.get()
+
+
+def find_game_camera(preferred=None):
+    from camera import find_camera
+
+    camera_index = find_camera(preferred=preferred)
+    if camera_index == -1:
+        print("Error: Could not open video source.")
+    return camera_index
+
+
+class Loader(threading.Thread):
+    # Runs the slow part of startup (heavy imports, asset downloads, the model,
+    # camera discovery) on a background thread while the menu is already on
+    # screen. Steps are (key, label, function); results are kept by key and
+    # the label is what the menu shows.
+    def __init__(self, steps):
+        super().__init__(daemon=True)
+        self.steps = steps
+        self.current = steps[0][1] if steps else ""
+        self.completed = 0
+        self.results = {}
+        self.times = {}
+        self.error = None
+        self.reported = False
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            for key, label, function in self.steps:
+                self.current = label
+                start = time.time()
+                self.results[key] = function()
+                self.times[key] = time.time() - start
+                self.completed += 1
+        except Exception as e:
+            self.error = e
+            print(f"Startup failed ({self.current}): {e}")
+        finally:
+            mark("loaded")
+            self._done.set()
+
+    @property
+    def progress(self):
+        return self.completed / len(self.steps) if self.steps else 1.0
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self.done and self.error is None
+
+    @property
+    def state(self):
+        # Changes whenever the menu's progress display does.
+        return (self.completed, self.current, self.done)
+
+    def status(self):
+        if self.error is not None:
+            return f"{self.current} failed: {self.error}"
+        return "Ready" if self.done else f"{self.current}..."
+
+    def report(self):
+        self.reported = True
+        steps = ", ".join(f"{key} {seconds:.2f} s" for key, seconds in self.times.items())
+        print(f"Startup: window {marks.get('window', 0.0):.2f} s, ready {marks.get('loaded', 0.0):.2f} s ({steps})")
+        path = os.environ.get("PETRA_STARTUP_REPORT")
+        if path:
+            with open(path, "w") as f:
+                json.dump({"marks": marks, "steps": self.times, "error": str(self.error) if self.error else None}, f)
+            # Launched by measure(): the numbers are written, nothing left to do.
+            sys.exit(0)
+
+
+def draw_progress(screen, rect, progress, color=(255, 255, 255)):
+    pygame.draw.rect(screen, color, rect, 2)
+    inner = rect.inflate(-6, -6)
+    inner.width = int(inner.width * progress)
+    pygame.draw.rect(screen, color, inner)
+
+
+def make_loader(assets, atlas, preferred_camera=None):
+    # The games' startup: libraries, then their assets, the camera and the model.
+    from assets import asset_cache
+
+    return Loader([
+        ("libraries", "Loading libraries", load_libraries),
+        ("assets", "Downloading assets", lambda: asset_cache.fetch_missing(assets, atlas)),
+        ("camera", "Finding camera", lambda: find_game_camera(preferred_camera)),
+        ("model", "Loading model", load_model),
+    ])
+
+
+def draw_loading(screen, loader, start_button, progress_bar):
+    # The start menu's lower half: Start, greyed out until the loader is ready,
+    # and the progress bar with the current step until then. Flips the display,
+    # so the caller draws the rest of the menu first.
+    pygame.draw.rect(screen, (255, 255, 255) if loader.ready else (128, 128, 128), start_button)
+    screen.blit(text_renderer.render("Start", 36, (0, 0, 0)), (start_button.x + 50, start_button.y + 25))
+    if not loader.ready:
+        draw_progress(screen, progress_bar, loader.progress)
+        screen.blit(text_renderer.render(loader.status(), 28, (255, 255, 255)), (progress_bar.x, progress_bar.bottom + 10))
+    pygame.display.flip()
+    mark("window")
+    if loader.done and not loader.reported:
+        loader.report()
+
+
+def measure(command, runs=3):
+    # Launches a game (a script or the PyInstaller build) headless until it is
+    # ready to play, and reports time to window and time to ready. Module import
+    # times for a script can be broken down further with `python -X importtime`.
+    import tempfile
+
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup.json")
+            env = dict(os.environ, PETRA_STARTUP_REPORT=path, PETRA_STARTUP_T0=repr(time.time()), SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+            start = time.time()
+            subprocess.run(command, env=env, stdout=subprocess.DEVNULL, timeout=300)
+            elapsed = time.time() - start
+            if not os.path.exists(path):
+                print(f"{' '.join(command)} exited after {elapsed:.2f} s without a startup report")
+                return None
+            with open(path) as f:
+                results.append(json.load(f))
+    window = sorted(result["marks"]["window"] for result in results)[len(results) // 2]
+    ready = sorted(result["marks"]["loaded"] for result in results)[len(results) // 2]
+    print(f"{' '.join(command)}: window after {window:.2f} s, ready after {ready:.2f} s (median of {runs})")
+    for key, seconds in results[-1]["steps"].items():
+        print(f"  {key:<10} {seconds:6.2f} s")
+    if results[-1]["error"]:
+        print(f"  failed: {results[-1]['error']}")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python startup.py game.py [runs]  |  python startup.py dist/game [runs]")
+        sys.exit(1)
+    target = sys.argv[1]
+    command = [sys.executable, target] if target.endswith(".py") else [os.path.abspath(target)]
+    sys.exit(0 if measure(command, int(sys.argv[2]) if len(sys.argv) > 2 else 3) else 1)
@@ -0,0 +1,50 @@
+import time
+
+
+class FixedTimestep:
+    # Accumulates wall-clock time and hands out fixed simulation steps, so game
+    # speed no longer depends on how fast the render/detection loop runs.
+    def __init__(self, dt, max_steps=8):
+        self.dt = dt
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.last = None
+        self.time = None
+        self.steps_run = 0
+        self.dropped_steps = 0
+
+    def reset(self, now=None):
+        # Call after anything that blocks the loop (menus) so the pause is not simulated.
+        self.last = time.time() if now is None else now
+        self.time = self.last
+        self.accumulator = 0.0
+
+    def steps(self, now=None):
+        # Yields the simulation time at the end of each step that is due.
+        now = time.time() if now is None else now
+        if self.last is None:
+            self.reset(now)
+        self.accumulator += now - self.last
+        self.last = now
+        due = int(self.accumulator / self.dt)
+        if due > self.max_steps:
+            # Spiral-of-death guard: skip what cannot be caught up.
+            skipped = due - self.max_steps
+            self.dropped_steps += skipped
+            self.accumulator -= skipped * self.dt
+            self.time += skipped * self.dt
+            due = self.max_steps
+        for _ in range(due):
+            self.accumulator -= self.dt
+            self.time += self.dt
+            self.steps_run += 1
+            yield self.time
+
+    @property
+    def alpha(self):
+        # Fraction of a step since the last simulated state, for interpolated rendering.
+        return min(self.accumulator / self.dt, 1.0)
+
+
+def lerp(previous, current, alpha):
+    return previous + (current - previous) * alpha
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+
+class _Span:
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class StageTimer:
+    # Collects per-stage durations (seconds) and summarises them as percentiles in ms.
+    # With window set only the most recent samples are kept, for live display; when
+    # disabled, span() hands back a shared no-op so instrumented code pays one branch.
+    def __init__(self, enabled=True, window=None):
+        self.enabled = enabled
+        self.window = window
+        self.samples = defaultdict(self._new_samples)
+        self.counters = {}
+        self._frame_times = deque(maxlen=window or 120)
+        self._lock = threading.Lock()
+
+    def _new_samples(self):
+        return deque(maxlen=self.window) if self.window else []
+
+    def span(self, stage):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, stage)
+
+    def add(self, stage, seconds):
+        # Safe to call from the capture and inference threads.
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def frame(self):
+        # Marks the end of a rendered frame, for the rolling FPS.
+        if self.enabled:
+            self._frame_times.append(time.perf_counter())
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    @property
+    def fps(self):
+        if len(self._frame_times) < 2:
+            return 0.0
+        return (len(self._frame_times) - 1) / (self._frame_times[-1] - self._frame_times[0])
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+        self.counters.clear()
+        self._frame_times.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self.samples.items() if len(values)}
+        summary = {}
+        for stage, values in samples.items():
+            summary[stage] = {
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "p99_ms": float(np.percentile(values, 99)),
+                "max_ms": float(values.max()),
+            }
+        return summary
+
+    def snapshot(self):
+        return {"time": time.time(), "fps": self.fps, "stages": self.summary(), "counters": dict(self.counters)}
+
+
+class MetricsExporter:
+    # Every `interval` seconds appends a snapshot as a JSON line, or rewrites a
+    # Prometheus text-format file (for node_exporter's textfile collector) when
+    # the path ends in .prom.
+    def __init__(self, timer, path, interval=5.0):
+        self.timer = timer
+        self.path = path
+        self.interval = interval
+        self.prometheus = path.endswith(".prom")
+        self._last = time.time()
+
+    def maybe_export(self):
+        now = time.time()
+        if now - self._last < self.interval:
+            return False
+        self._last = now
+        self.export()
+        return True
+
+    def export(self):
+        snapshot = self.timer.snapshot()
+        if not self.prometheus:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(snapshot) + "\n")
+            return
+        lines = ["# TYPE petra_fps gauge", f"petra_fps {snapshot['fps']:.3f}", "# TYPE petra_stage_ms gauge"]
+        for stage, stats in snapshot["stages"].items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'petra_stage_ms{{stage="{stage}",quantile="{quantile}"}} {stats[key]:.3f}')
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE petra_{name} gauge")
+            lines.append(f"petra_{name} {value}")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+def metrics_from_env(window=120):
+    # PETRA_METRICS=<file.jsonl|file.prom> turns timing on and exports it;
+    # PETRA_PROFILE=1 only turns timing on (the overlay can also enable it later).
+    path = os.environ.get("PETRA_METRICS")
+    timer = StageTimer(enabled=bool(path) or os.environ.get("PETRA_PROFILE") == "1", window=window)
+    return timer, MetricsExporter(timer, path) if path else None
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class KalmanTrack:
+    # Constant-velocity Kalman filter on the box centre; width/height are smoothed separately.
+    def __init__(self, track_id, box, cls, conf, timestamp, process_noise=5000.0, measurement_noise=16.0):
+        x1, y1, x2, y2 = box
+        self.id = track_id
+        self.cls = int(cls)
+        self.conf = conf
+        self.state = np.array([(x1 + x2) / 2, (y1 + y2) / 2, 0.0, 0.0])
+        self.covariance = np.diag([measurement_noise, measurement_noise, 1e6, 1e6])
+        self.size = np.array([x2 - x1, y2 - y1], dtype=np.float64)
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.timestamp = timestamp
+        self.hits = 1
+        self.misses = 0
+        self.delta = np.zeros(2)
+        self._corrected_center = self.state[:2].copy()
+
+    @property
+    def center(self):
+        return self.state[:2]
+
+    @property
+    def velocity(self):
+        return self.state[2:]
+
+    @property
+    def box(self):
+        half = self.size / 2
+        return np.concatenate((self.center - half, self.center + half))
+
+    def predicted_center(self, timestamp):
+        return self.center + self.velocity * max(timestamp - self.timestamp, 0.0)
+
+    def predicted_box(self, timestamp):
+        center = self.predicted_center(timestamp)
+        half = self.size / 2
+        return np.concatenate((center - half, center + half))
+
+    def predict(self, timestamp):
+        dt = max(timestamp - self.timestamp, 0.0)
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        q = self.process_noise
+        noise = q * np.array([
+            [dt ** 4 / 4, 0, dt ** 3 / 2, 0],
+            [0, dt ** 4 / 4, 0, dt ** 3 / 2],
+            [dt ** 3 / 2, 0, dt ** 2, 0],
+            [0, dt ** 3 / 2, 0, dt ** 2],
+        ])
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + noise
+        self.timestamp = timestamp
+
+    def correct(self, box, conf):
+        x1, y1, x2, y2 = box
+        measurement = np.array([(x1 + x2) / 2, (y1 + y2) / 2])
+        innovation = measurement - self.state[:2]
+        innovation_cov = self.covariance[:2, :2] + np.eye(2) * self.measurement_noise
+        gain = self.covariance[:, :2] @ np.linalg.inv(innovation_cov)
+        self.state = self.state + gain @ innovation
+        self.covariance = self.covariance - gain @ self.covariance[:2, :]
+        self.size += 0.5 * (np.array([x2 - x1, y2 - y1]) - self.size)
+        self.conf = conf
+        self.delta = self.center - self._corrected_center
+        self._corrected_center = self.center.copy()
+        self.hits += 1
+        self.misses = 0
+
+
+class Tracker:
+    # Associates detections to persistent tracks so two balls of the same class no
+    # longer overwrite each other, and predicts positions between detections.
+    def __init__(self, iou_weight=0.5, max_distance=150.0, max_misses=10):
+        self.iou_weight = iou_weight
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = 1
+
+    def _cost(self, tracks, boxes, timestamp):
+        predicted = np.array([track.predicted_box(timestamp) for track in tracks])
+        track_centers = (predicted[:, :2] + predicted[:, 2:]) / 2
+        det_centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        distance = np.linalg.norm(track_centers[:, None, :] - det_centers[None, :, :], axis=2)
+        cost = (1 - self.iou_weight) * np.minimum(distance / self.max_distance, 1.0)
+        cost += self.iou_weight * (1 - iou_matrix(predicted, boxes))
+        cost[distance > self.max_distance] = np.inf
+        return cost
+
+    def update(self, detections, timestamp):
+        # detections: rows of [x1, y1, x2, y2, conf, cls]. Returns the tracks seen this update.
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        boxes = detections[:, :4]
+        classes = detections[:, 5].astype(int)
+        matched_tracks = set()
+        matched_dets = set()
+
+        if self.tracks and len(detections):
+            cost = self._cost(self.tracks, boxes, timestamp)
+            cost[np.array([t.cls for t in self.tracks])[:, None] != classes[None, :]] = np.inf
+            # Greedy assignment in order of increasing cost is plenty for a handful of balls.
+            for flat in np.argsort(cost, axis=None):
+                t, d = np.unravel_index(flat, cost.shape)
+                if not np.isfinite(cost[t, d]):
+                    break
+                if t in matched_tracks or d in matched_dets:
+                    continue
+                matched_tracks.add(t)
+                matched_dets.add(d)
+                track = self.tracks[t]
+                track.predict(timestamp)
+                track.correct(boxes[d], detections[d, 4])
+
+        visible = [self.tracks[t] for t in sorted(matched_tracks)]
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for d in range(len(detections)):
+            if d not in matched_dets:
+                track = KalmanTrack(self._next_id, boxes[d], classes[d], detections[d, 4], timestamp)
+                self._next_id += 1
+                self.tracks.append(track)
+                visible.append(track)
+        return visible
+
+    def predict(self, timestamp):
+        # Extrapolated boxes for every live track, for frames where detection was skipped.
+        return [(track, track.predicted_box(timestamp)) for track in self.tracks]
+
+    def reset(self):
+        self.tracks = []